@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from functools import wraps
+
+import jwt
+from flask import g, has_app_context, jsonify, request
+
+from cache import TTLCache
+
+TOKEN_EXPIRATION_TIME = 3600
+# Verified tokens kept so repeat requests skip the HMAC check
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+# Users whose follow list and preference are kept between requests
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+# Longest a cached user may go unrefreshed if a change notification is missed (seconds)
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 300))
+
+
+class UserNotFound(Exception):
+    """The token is valid but the user it names no longer exists."""
+
+
+class UserContext:
+    """The signed-in user's row and follow list, shared between requests until it changes."""
+
+    __slots__ = ("id", "username", "game_pk", "player_ids")
+
+    def __init__(self, user_id, username, game_pk, player_ids):
+        self.id = user_id
+        self.username = username
+        self.game_pk = game_pk
+        self.player_ids = player_ids
+
+
+class TokenCache:
+    """Bounded LRU of verified JWT payloads, each kept until its own exp."""
+
+    def __init__(self, secret_key, max_entries=AUTH_TOKEN_CACHE_SIZE):
+        self.secret_key = secret_key
+        self.max_entries = max_entries
+        self._payloads = OrderedDict()
+        self._lock = threading.Lock()
+
+    def decode(self, token):
+        with self._lock:
+            payload = self._payloads.get(token)
+            if payload is not None:
+                if payload["exp"] > time.time():
+                    self._payloads.move_to_end(token)
+                    return payload
+                del self._payloads[token]
+
+        # Not cached or expired: a full decode verifies (or rejects) it
+        # Both are read unchecked later; a signed token missing either is invalid, not a crash
+        payload = jwt.decode(token, self.secret_key, algorithms=["HS256"], options={"require": ["exp", "user_id"]})
+        with self._lock:
+            self._payloads[token] = payload
+            while len(self._payloads) > self.max_entries:
+                self._payloads.popitem(last=False)
+        return payload
+
+
+class Authenticator:
+    """Issues tokens and guards routes that need a signed-in user."""
+
+    def __init__(self, secret_key, db_pool):
+        self.secret_key = secret_key
+        self.db_pool = db_pool
+        self.tokens = TokenCache(secret_key)
+        # Evicted on the user's own writes and on change notifications from other workers
+        self.users = TTLCache(self._load_cached, max_entries=USER_CACHE_SIZE, ttl=USER_CACHE_TTL,
+                              serve_stale=False)
+
+    def issue_token(self, user_id):
+        return jwt.encode(
+            {
+                "user_id": user_id,
+                "exp": datetime.now(timezone.utc) + timedelta(seconds=TOKEN_EXPIRATION_TIME),
+            },
+            self.secret_key,
+            algorithm="HS256",
+        )
+
+    def decode(self, token):
+        return self.tokens.decode(token)
+
+    def login_required(self, view):
+        """Reject requests without a valid Bearer token and record the user id in ``g``."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = request.headers.get("Authorization", "").split("Bearer ")[-1].strip()
+            if not token:
+                return jsonify({"error": "Missing token"}), 401
+
+            try:
+                payload = self.decode(token)
+            except jwt.ExpiredSignatureError:
+                return jsonify({"error": "Token has expired"}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({"error": "Invalid token"}), 401
+
+            g.user_id = payload["user_id"]
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    def current_user(self):
+        """The signed-in user's context, from the user cache or one query, fixed for the rest of the request."""
+        if "user" not in g:
+            user = self.users.get(g.user_id)
+            if user is None:
+                raise UserNotFound("User not found")
+            g.user = user
+        return g.user
+
+    def invalidate_user(self, user_id, change=None):
+        """Forget the cached context after the user's follows or preference changed.
+
+        Also the ``UserChangeListener`` callback for changes made on other workers.
+        """
+        self.users.invalidate(user_id)
+        if has_app_context():
+            user = g.get("user")
+            if user is not None and user.id == user_id:
+                g.pop("user")
+
+    def _load_cached(self, user_id):
+        try:
+            return self.load_user(user_id)
+        except UserNotFound:
+            return None
+
+    def load_user(self, user_id):
+        with self.db_pool.connection() as connection:
+            cur = connection.cursor()
+            select_query = """
+                SELECT u.username,
+                       u.game_pk,
+                       COALESCE(
+                           array_agg(p.player_id ORDER BY p.added_at DESC)
+                               FILTER (WHERE p.player_id IS NOT NULL),
+                           ARRAY[]::INTEGER[]
+                       )
+                FROM user_data u
+                LEFT JOIN user_players p ON p.user_id = u.id
+                WHERE u.id = %s
+                GROUP BY u.id;
+            """
+            cur.execute(select_query, (user_id,), name="load_user")
+            row = cur.fetchone()
+            cur.close()
+
+        if row is None:
+            raise UserNotFound("User not found")
+        return UserContext(user_id, row[0], row[1], tuple(row[2]))
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Background refreshes for stale entries share one small pool
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTL and stale-while-revalidate.
+
+    An expired entry is still returned straight away while ``loader`` runs
+    in the background to replace it, unless ``serve_stale`` is off, in
+    which case it counts as a miss. Loaders return ``None`` for keys that
+    do not exist; those results are never cached.
+
+    A load that was already running when a key was invalidated is not
+    cached, so an invalidation can't be undone by a read that raced it.
+    """
+
+    def __init__(self, loader, max_entries=1000, ttl=3600, serve_stale=True):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.serve_stale = serve_stale
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _lookup(self, key):
+        """Return (value, found) for a key, scheduling a refresh when it is stale."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+
+            value, expires_at = entry
+            self._entries.move_to_end(key)
+            if expires_at > time.monotonic():
+                self.hits += 1
+                return value, True
+
+            if not self.serve_stale:
+                del self._entries[key]
+                self.misses += 1
+                return None, False
+
+            self.stale_hits += 1
+            if key not in self._refreshing:
+                self._refreshing.add(key)
+                _refresh_executor.submit(self._refresh, key)
+            return value, True
+
+    def _refresh(self, key):
+        generation = self._generation
+        try:
+            value = self.loader(key)
+            if value is not None:
+                self._set_unless_invalidated(key, value, generation)
+        except Exception as e:
+            # Keep serving the stale value; the next read retries
+            metrics.background_errors.inc("cache_refresh")
+            print(f"Error refreshing cache entry {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key):
+        value, found = self._lookup(key)
+        if found:
+            return value
+
+        generation = self._generation
+        value = self.loader(key)
+        if value is not None:
+            self._set_unless_invalidated(key, value, generation)
+        return value
+
+    def get_many(self, keys, load_many):
+        """Look up several keys at once.
+
+        Misses are handed to ``load_many`` in a single call, which must
+        return a dict of the keys it could load. Returns a dict of every
+        key that was found.
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            value, hit = self._lookup(key)
+            if hit:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        if missing:
+            generation = self._generation
+            for key, value in load_many(missing).items():
+                if value is not None:
+                    self._set_unless_invalidated(key, value, generation)
+                    found[key] = value
+        return found
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _set_unless_invalidated(self, key, value, generation):
+        with self._lock:
+            if self._generation == generation:
+                self._store(key, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "staleHits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
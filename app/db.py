@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+import metrics
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+# How long a request may wait for a free connection (seconds)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))
+# Server-side cap on any single statement (milliseconds, 0 disables)
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", 5000))
+# Connections idle for longer than this are pinged before being handed out (seconds)
+DB_VALIDATE_AFTER = float(os.getenv("DB_VALIDATE_AFTER", 30))
+
+
+class PoolTimeout(Exception):
+    """No connection became free within DB_POOL_TIMEOUT."""
+
+
+class TimedCursor(extensions.cursor):
+    """Cursor that records each statement's duration under a name.
+
+    ``execute`` takes an optional ``name`` keyword; statements run without
+    one (execute_values, for instance) are named by verb and table.
+    """
+
+    def execute(self, query, vars=None, name=None):
+        name = name or metrics.statement_name(query)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        except psycopg2.Error:
+            metrics.db_query_errors.inc(name)
+            raise
+        finally:
+            metrics.db_query_duration.observe(name, value=time.perf_counter() - started)
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool with bounded waits and checkout validation."""
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, wait_timeout=DB_POOL_TIMEOUT,
+                 statement_timeout=DB_STATEMENT_TIMEOUT, validate_after=DB_VALIDATE_AFTER):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.wait_timeout = wait_timeout
+        self.statement_timeout = statement_timeout
+        self.validate_after = validate_after
+        self._pool = None
+        self._init_lock = threading.Lock()
+        # psycopg2 raises as soon as the pool is exhausted; the semaphore makes callers queue instead
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.in_use = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    kwargs = {"cursor_factory": TimedCursor}
+                    if self.statement_timeout:
+                        kwargs["options"] = f"-c statement_timeout={self.statement_timeout}"
+                    self._pool = pool.ThreadedConnectionPool(self.minconn, self.maxconn, self.dsn, **kwargs)
+        return self._pool
+
+    def _is_alive(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0) < self.validate_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;", name="ping")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        db_pool = self._get_pool()
+        # Every connection in the pool may be dead after a DB restart, so try each once
+        for _ in range(self.maxconn + 1):
+            conn = db_pool.getconn()
+            if self._is_alive(conn):
+                return conn
+            self._last_used.pop(id(conn), None)
+            db_pool.putconn(conn, close=True)
+            with self._stats_lock:
+                self.discarded += 1
+        raise psycopg2.OperationalError("Could not obtain a live database connection")
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a ``with`` block.
+
+        Uncommitted work is rolled back when the block exits, so a failed
+        statement never leaks an aborted transaction to the next request.
+        """
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            with self._stats_lock:
+                self.timeouts += 1
+            raise PoolTimeout("Timed out waiting for a database connection")
+
+        waited = time.monotonic() - started
+        with self._stats_lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        finally:
+            if conn is not None:
+                broken = bool(conn.closed)
+                if not broken:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        broken = True
+                if broken:
+                    self._last_used.pop(id(conn), None)
+                else:
+                    self._last_used[id(conn)] = time.monotonic()
+                self._get_pool().putconn(conn, close=broken)
+            with self._stats_lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "minConnections": self.minconn,
+                "maxConnections": self.maxconn,
+                "inUse": self.in_use,
+                "checkouts": self.checkouts,
+                "waitTimeouts": self.timeouts,
+                "discarded": self.discarded,
+                "waitSecondsTotal": round(self.wait_seconds_total, 6),
+                "waitSecondsMax": round(self.wait_seconds_max, 6),
+            }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.closeall()
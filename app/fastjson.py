@@ -0,0 +1,31 @@
+import abc
+
+import orjson
+
+_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+
+class Encoded(abc.ABC):
+    """Base for values that hold their own pre-encoded JSON, spliced into responses as-is."""
+
+    __slots__ = ()
+
+    @abc.abstractmethod
+    def json_bytes(self):
+        """The value as JSON bytes."""
+
+
+def dumps(value):
+    """Compact JSON bytes with sorted keys, as jsonify writes them."""
+    return orjson.dumps(value, option=_OPTIONS)
+
+
+def _splice(value):
+    if isinstance(value, Encoded):
+        return orjson.Fragment(value.json_bytes())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode(value):
+    """Like dumps, but ``Encoded`` values anywhere in ``value`` are spliced in without re-encoding."""
+    return orjson.dumps(value, default=_splice, option=_OPTIONS)
@@ -0,0 +1,268 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+import upstream
+
+GAME_LOG_URL = upstream.STATSAPI_URL + "/api/v1/people/{player_id}/stats?stats=gameLog&group=hitting,pitching&season={season}"
+
+# How long the current season's logs are used before checking for newly final games (seconds)
+GAME_LOG_REFRESH_INTERVAL = int(os.getenv("GAME_LOG_REFRESH_INTERVAL", 15 * 60))
+# Player-seasons kept in memory
+GAME_LOG_CACHE_SIZE = int(os.getenv("GAME_LOG_CACHE_SIZE", 5000))
+
+# Stored columns per group, in order; all are counts read straight from the statsapi split
+HITTING_COLUMNS = ("atBats", "hits", "doubles", "triples", "homeRuns", "baseOnBalls", "hitByPitch", "sacFlies",
+                   "plateAppearances", "strikeOuts", "rbi")
+PITCHING_COLUMNS = ("outs", "earnedRuns", "hits", "baseOnBalls", "hitByPitch", "strikeOuts", "homeRuns",
+                    "battersFaced")
+GROUPS = {"hitting": HITTING_COLUMNS, "pitching": PITCHING_COLUMNS}
+
+AB, H, DOUBLES, TRIPLES, HR, BB, HBP, SF, PA, SO, RBI = range(len(HITTING_COLUMNS))
+OUTS, ER, P_H, P_BB, P_HBP, P_SO, P_HR, BF = range(len(PITCHING_COLUMNS))
+
+
+class ColumnLog:
+    """One player-season's games for one stat group, stored column-wise.
+
+    ``values`` is an ``(n, columns)`` int32 array with ``home`` and
+    ``game_pks`` alongside, in game order. Rows are appended into spare
+    capacity and ``n`` is bumped last, so a reader that takes ``view()``
+    always sees whole rows. A game fetched while in progress has a
+    partial line, so a stored game seen again is overwritten in place.
+    """
+
+    def __init__(self, width, capacity=32):
+        self.values = np.zeros((capacity, width), dtype=np.int32)
+        self.home = np.zeros(capacity, dtype=bool)
+        self.game_pks = np.zeros(capacity, dtype=np.int64)
+        self.n = 0
+        self.last_date = None
+        self._positions = {}
+
+    def append(self, rows):
+        """Add ``(date, game_pk, is_home, counts)`` rows, updating games already stored.
+
+        Returns how many rows were added or changed.
+        """
+        changed = 0
+        new_rows = []
+        for row in rows:
+            position = self._positions.get(row[1])
+            if position is None:
+                new_rows.append(row)
+            elif self.values[position].tolist() != row[3]:
+                # One row assignment, so readers see either the old line or the new one
+                self.values[position] = row[3]
+                changed += 1
+        rows = new_rows
+        if not rows:
+            return changed
+        needed = self.n + len(rows)
+        if needed > len(self.values):
+            capacity = max(needed, 2 * len(self.values))
+            self.values = np.resize(self.values, (capacity, self.values.shape[1]))
+            self.home = np.resize(self.home, capacity)
+            self.game_pks = np.resize(self.game_pks, capacity)
+
+        end = self.n + len(rows)
+        self.values[self.n:end] = [row[3] for row in rows]
+        self.home[self.n:end] = [row[2] for row in rows]
+        self.game_pks[self.n:end] = [row[1] for row in rows]
+        self._positions.update((row[1], position) for position, row in enumerate(rows, self.n))
+        self.last_date = max(self.last_date or "", max(row[0] for row in rows))
+        self.n = end
+        return changed + len(rows)
+
+    def view(self):
+        n = self.n
+        return self.values[:n], self.home[:n]
+
+
+class PlayerSeason:
+    __slots__ = ("player_id", "season", "logs", "loaded_at")
+
+    def __init__(self, player_id, season):
+        self.player_id = player_id
+        self.season = season
+        self.logs = {group: ColumnLog(len(columns)) for group, columns in GROUPS.items()}
+        self.loaded_at = None
+
+
+def parse_game_log(data):
+    """``{group: [(date, game_pk, is_home, counts), ...]}`` from a statsapi gameLog response."""
+    rows = {group: [] for group in GROUPS}
+    for block in data.get("stats", []):
+        group = block.get("group", {}).get("displayName")
+        columns = GROUPS.get(group)
+        if columns is None:
+            continue
+        for split in block.get("splits", []):
+            game_pk = split.get("game", {}).get("gamePk")
+            if game_pk is None:
+                continue
+            stat = split.get("stat", {})
+            counts = [int(stat.get(column) or 0) for column in columns]
+            rows[group].append((split.get("date", ""), game_pk, bool(split.get("isHome")), counts))
+    for group_rows in rows.values():
+        group_rows.sort(key=lambda row: (row[0], row[1]))
+    return rows
+
+
+class GameLogStore:
+    """Per player-season game logs, fetched once and then topped up with newly final games.
+
+    Past seasons never change, so they are loaded once. The current
+    season is re-checked after the refresh interval, asking statsapi only
+    for games since the last stored date, whose lines are re-read in case
+    they were still in progress.
+    """
+
+    def __init__(self, refresh_interval=GAME_LOG_REFRESH_INTERVAL, max_entries=GAME_LOG_CACHE_SIZE):
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.rows_appended = 0
+
+    def _entry(self, player_id, season):
+        key = (player_id, season)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = PlayerSeason(player_id, season)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(key)
+        return entry
+
+    def _needs_fetch(self, entry, now):
+        if entry.loaded_at is None:
+            return True
+        return entry.season >= datetime.now().year and now - entry.loaded_at > self.refresh_interval
+
+    def get_many(self, player_ids, season):
+        """PlayerSeason for each id, in order, fetching whatever is missing or due in one parallel batch."""
+        now = time.monotonic()
+        with self._lock:
+            entries = [self._entry(player_id, season) for player_id in player_ids]
+        due = [entry for entry in entries if self._needs_fetch(entry, now)]
+        if not due:
+            return entries
+
+        urls = []
+        for entry in due:
+            url = GAME_LOG_URL.format(player_id=entry.player_id, season=season)
+            last_dates = [log.last_date for log in entry.logs.values() if log.last_date]
+            if last_dates:
+                # Only games from the last stored date on; that day's games may have been stored mid-game,
+                # and append overwrites them with their lines as they stand now
+                url += f"&startDate={min(last_dates)}"
+            urls.append(url)
+
+        # Entries keep serving their stored games if a fetch fails, so no fallback copies are needed
+        results = upstream.fetch_json_many(urls, fallback=False)
+        with self._lock:
+            self.fetches += len(urls)
+            for entry, data in zip(due, results):
+                if isinstance(data, Exception):
+                    # Serve what we have; the next request tries again
+                    continue
+                for group, rows in parse_game_log(data).items():
+                    self.rows_appended += entry.logs[group].append(rows)
+                entry.loaded_at = now
+        return entries
+
+    def stats(self):
+        with self._lock:
+            return {"playerSeasons": len(self._entries), "fetches": self.fetches, "rowsAppended": self.rows_appended}
+
+
+def _stack(logs, width):
+    """Concatenate several logs into one values array plus each row's owner and position from the end."""
+    views = [log.view() for log in logs]
+    lengths = np.array([len(values) for values, _ in views], dtype=np.int64)
+    if not lengths.sum():
+        return np.zeros((0, width), dtype=np.int64), np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64), \
+            np.zeros(0, dtype=np.int64), lengths
+    values = np.concatenate([values for values, _ in views]).astype(np.int64)
+    home = np.concatenate([home for _, home in views])
+    owner = np.repeat(np.arange(len(logs)), lengths)
+    ends = np.cumsum(lengths)
+    # 1 for each player's latest game, 2 for the one before, ...
+    from_end = ends[owner] - np.arange(len(values))
+    return values, home, owner, from_end, lengths
+
+
+def _totals(values, owner, mask, count):
+    totals = np.zeros((count, values.shape[1]), dtype=np.int64)
+    np.add.at(totals, owner[mask], values[mask])
+    return totals
+
+
+def _ratio(numerator, denominator, scale=1.0):
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator * scale, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def hitting_rates(t):
+    """AVG/OBP/SLG/OPS for every row of a totals array at once."""
+    total_bases = t[:, H] + t[:, DOUBLES] + 2 * t[:, TRIPLES] + 3 * t[:, HR]
+    avg = _ratio(t[:, H], t[:, AB])
+    obp = _ratio(t[:, H] + t[:, BB] + t[:, HBP], t[:, AB] + t[:, BB] + t[:, HBP] + t[:, SF])
+    slg = _ratio(total_bases, t[:, AB])
+    return {"avg": avg, "obp": obp, "slg": slg, "ops": obp + slg}
+
+
+def pitching_rates(t):
+    """ERA/WHIP/K9 for every row of a totals array at once; innings are outs / 3."""
+    return {
+        "era": _ratio(t[:, ER], t[:, OUTS], 27),
+        "whip": _ratio(t[:, P_H] + t[:, P_BB], t[:, OUTS], 3),
+        "k9": _ratio(t[:, P_SO], t[:, OUTS], 27),
+    }
+
+
+def _format(rate, digits):
+    return None if np.isnan(rate) else round(float(rate), digits)
+
+
+def aggregate(entries, windows=(7, 15)):
+    """Season, last-N-game and home/away lines for many players, computed per group in one pass each.
+
+    Returns ``{player_id: {group: {split: {...}}}}``; a group is left out
+    for players with no games in it.
+    """
+    report = {entry.player_id: {} for entry in entries}
+    for group, columns in GROUPS.items():
+        values, home, owner, from_end, lengths = _stack([entry.logs[group] for entry in entries], len(columns))
+        count = len(entries)
+        everything = np.ones(len(values), dtype=bool)
+        splits = {"season": everything, "home": home, "away": ~home}
+        for window in windows:
+            splits[f"last{window}"] = from_end <= window
+
+        rates_for = hitting_rates if group == "hitting" else pitching_rates
+        computed = {}
+        for name, mask in splits.items():
+            totals = _totals(values, owner, mask, count)
+            games = np.bincount(owner[mask], minlength=count)
+            computed[name] = (totals, games, rates_for(totals))
+
+        for i, entry in enumerate(entries):
+            if not lengths[i]:
+                continue
+            group_report = report[entry.player_id][group] = {}
+            for name, (totals, games, rates) in computed.items():
+                line = {"games": int(games[i])}
+                line.update(zip(columns, totals[i].tolist()))
+                if group == "pitching":
+                    line["inningsPitched"] = f"{totals[i, OUTS] // 3}.{totals[i, OUTS] % 3}"
+                line.update((rate, _format(value[i], 3 if group == "hitting" else 2)) for rate, value in rates.items())
+                group_report[name] = line
+    return report
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+# bcrypt work factor for new hashes; existing hashes are upgraded on login
+BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 2))
+# Hash jobs allowed to wait behind the busy workers before we start rejecting
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", 32))
+
+
+class HashPoolFull(Exception):
+    """Every hashing worker is busy and the wait queue is full."""
+
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check_password(hashed_password, password):
+    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+class PasswordHasher:
+    """Runs bcrypt in a process pool so hashing never blocks request threads.
+
+    Workers come from a forkserver: by the first login this process has
+    several threads running, and forking it could hand a worker a lock
+    some other thread held. A pool broken by a dead worker is replaced.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, queue_size=HASH_QUEUE_SIZE, rounds=BCRYPT_LOG_ROUNDS):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rounds = rounds
+        self._executor = None
+        self._init_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._init_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context("forkserver"))
+        return self._executor
+
+    def _replace_executor(self, broken):
+        with self._init_lock:
+            # Several callers may see the same broken pool; only the first replaces it
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False)
+
+    def _submit(self, fn, *args):
+        executor = self._get_executor()
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A worker died; hashing is pure, so run the job again on a fresh pool
+            self._replace_executor(executor)
+            return self._get_executor().submit(fn, *args).result()
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise HashPoolFull("Password hashing is at capacity, try again shortly")
+
+        started = time.monotonic()
+        with self._stats_lock:
+            self.in_flight += 1
+        try:
+            return self._submit(fn, *args)
+        finally:
+            elapsed = time.monotonic() - started
+            with self._stats_lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self.seconds_total += elapsed
+                self.seconds_max = max(self.seconds_max, elapsed)
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.rounds)
+
+    def check(self, hashed_password, password):
+        return self._run(_check_password, hashed_password, password)
+
+    def needs_rehash(self, hashed_password):
+        """True when a stored hash was made with a different work factor."""
+        try:
+            return int(hashed_password.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "queueSize": self.queue_size,
+                "rounds": self.rounds,
+                "inFlight": self.in_flight,
+                "queueDepth": max(self.in_flight - self.workers, 0),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "secondsTotal": round(self.seconds_total, 6),
+                "secondsMax": round(self.seconds_max, 6),
+            }
@@ -0,0 +1,160 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+from PIL import Image
+
+import upstream
+
+HEADSHOT_URL = "https://securea.mlb.com/mlb/images/players/head_shot/{player_id}.jpg"
+
+HEADSHOT_CACHE_DIR = os.getenv("HEADSHOT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "headshots"))
+# Disk budget for cached images; least recently served files go first
+HEADSHOT_CACHE_MAX_BYTES = int(os.getenv("HEADSHOT_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+# Longest edge in pixels for each variant; None keeps the original
+VARIANTS = {"full": None, "thumb": 120}
+
+
+class HeadshotCache:
+    """Content-addressed on-disk cache of MLB headshots.
+
+    Image bytes live in ``blobs/<sha256>.jpg`` so identical images (MLB's
+    generic silhouette, for one) are stored once, and the hash doubles as
+    a strong ETag. ``refs/<player_id>-<variant>`` holds the hash for each
+    request key. Serving a blob bumps its mtime, which is what the LRU
+    eviction orders by; a ref to an evicted blob just triggers a refetch.
+    Files are written in ``tmp/`` and renamed into place, so eviction
+    never sees one half written.
+
+    Several workers may share the directory, so its size is taken from a
+    fresh scan whenever a new blob is added rather than counted locally.
+    """
+
+    def __init__(self, root=HEADSHOT_CACHE_DIR, max_bytes=HEADSHOT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, "blobs")
+        self.ref_dir = os.path.join(root, "refs")
+        self.tmp_dir = os.path.join(root, "tmp")
+        self._dirs_made = False
+        self._flight = upstream.SingleFlight()
+        self._evict_lock = threading.Lock()
+        self._size = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, f"{digest}.jpg")
+
+    def _ref_path(self, player_id, variant):
+        return os.path.join(self.ref_dir, f"{player_id}-{variant}")
+
+    def _make_dirs(self):
+        """Create the cache directories on first write, so building the cache touches no disk."""
+        if not self._dirs_made:
+            for path in (self.blob_dir, self.ref_dir, self.tmp_dir):
+                os.makedirs(path, exist_ok=True)
+            self._dirs_made = True
+
+    def _atomic_write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read_ref(self, player_id, variant):
+        try:
+            with open(self._ref_path(player_id, variant)) as f:
+                digest = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return digest if os.path.exists(self.blob_path(digest)) else None
+
+    def _store(self, player_id, variant, data):
+        self._make_dirs()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            self._atomic_write(path, data)
+            self._grow()
+        self._atomic_write(self._ref_path(player_id, variant), digest.encode())
+        return digest
+
+    def _load(self, player_id, variant):
+        if variant == "full":
+            data = upstream.fetch_bytes(HEADSHOT_URL.format(player_id=player_id))
+        else:
+            # Variants are made from the cached original, generated once and stored
+            with open(self.blob_path(self.get(player_id, "full")), "rb") as f:
+                data = resize(f.read(), VARIANTS[variant])
+        return self._store(player_id, variant, data)
+
+    def get(self, player_id, variant="full"):
+        """Hash of the cached image for a player and variant, fetching it on a miss."""
+        digest = self._read_ref(player_id, variant)
+        if digest is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            digest = self._flight.do((player_id, variant), lambda: self._read_ref(player_id, variant)
+                                     or self._load(player_id, variant))
+        try:
+            os.utime(self.blob_path(digest))
+        except FileNotFoundError:
+            pass
+        return digest
+
+    def _blobs(self):
+        """``(mtime, size, path)`` of every stored blob, skipping any another worker removed mid-scan."""
+        blobs = []
+        for entry in os.scandir(self.blob_dir):
+            if not entry.name.endswith(".jpg"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, entry.path))
+        return blobs
+
+    def _grow(self):
+        with self._evict_lock:
+            blobs = self._blobs()
+            self._size = sum(size for _, size, _ in blobs)
+            if self._size > self.max_bytes:
+                self._evict(blobs)
+
+    def _evict(self, blobs):
+        """Delete least recently served blobs until the cache is back under 90% of its budget."""
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(blobs):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass  # Another worker evicted it already
+            self._size -= size
+
+    def stats(self):
+        return {
+            "bytes": self._size,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def resize(data, longest_edge):
+    """Scale a JPEG down so its longest edge is at most ``longest_edge`` pixels."""
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail((longest_edge, longest_edge))
+    output = io.BytesIO()
+    image.convert("RGB").save(output, format="JPEG", quality=85, optimize=True)
+    return output.getvalue()
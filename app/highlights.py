@@ -0,0 +1,315 @@
+import os
+import threading
+import time
+
+# Games nobody has asked about for this long stop being tracked (seconds)
+HIGHLIGHTS_IDLE_SECONDS = float(os.getenv("HIGHLIGHTS_IDLE_SECONDS", 15 * 60))
+# How often idle and nonexistent games are swept out (seconds)
+HIGHLIGHTS_SWEEP_SECONDS = float(os.getenv("HIGHLIGHTS_SWEEP_SECONDS", 60))
+
+ALL_PLAYS_PATH = "/liveData/plays/allPlays"
+PLAYERS_PATH = "/gameData/players"
+
+# Column positions in the per-player stat lists
+PA, AB, RUNS, HITS, DOUBLES, TRIPLES, HOME_RUNS, RBI, WALKS, STRIKEOUTS, HIT_BY_PITCH = range(11)
+BATTING_FIELDS = ("plateAppearances", "atBats", "runs", "hits", "doubles", "triples", "homeRuns", "rbi",
+                  "baseOnBalls", "strikeOuts", "hitByPitch")
+BATTERS_FACED, OUTS, HITS_ALLOWED, RUNS_ALLOWED, EARNED_RUNS, WALKS_ALLOWED, STRIKEOUTS_PITCHED, \
+    HOME_RUNS_ALLOWED, PITCHES = range(9)
+PITCHING_FIELDS = ("battersFaced", "outs", "hits", "runs", "earnedRuns", "baseOnBalls", "strikeOuts",
+                   "homeRuns", "numberOfPitches")
+
+BATTING, PITCHING = 0, 1
+
+HIT_COLUMNS = {"single": None, "double": DOUBLES, "triple": TRIPLES, "home_run": HOME_RUNS}
+WALK_EVENTS = {"walk", "intent_walk"}
+STRIKEOUT_EVENTS = {"strikeout", "strikeout_double_play", "strikeout_triple_play"}
+# Plate appearances that do not count as at-bats
+NON_AT_BAT_EVENTS = WALK_EVENTS | {"hit_by_pitch", "sac_fly", "sac_bunt", "sac_fly_double_play",
+                                   "sac_bunt_double_play", "catcher_interf"}
+# Plays worth calling out even when nobody scored on them
+KEY_EVENTS = {"home_run", "triple", "double", "strikeout", "strikeout_double_play", "grounded_into_double_play",
+              "double_play", "triple_play", "caught_stealing_home", "pickoff_caught_stealing_home"}
+
+
+def play_contribution(play):
+    """What one play adds to the game: ``(stat deltas, key play or None)``.
+
+    Deltas are ``(BATTING|PITCHING, player_id, column, amount)`` tuples.
+    Plays still in progress contribute nothing until they complete.
+    """
+    about = play.get("about", {})
+    if not about.get("isComplete"):
+        return (), None
+
+    result = play.get("result", {})
+    matchup = play.get("matchup", {})
+    event = result.get("eventType")
+    batter = matchup.get("batter", {}).get("id")
+    pitcher = matchup.get("pitcher", {}).get("id")
+
+    deltas = []
+    if result.get("type") == "atBat":
+        if batter is not None:
+            deltas.append((BATTING, batter, PA, 1))
+            if event not in NON_AT_BAT_EVENTS:
+                deltas.append((BATTING, batter, AB, 1))
+            if event in HIT_COLUMNS:
+                deltas.append((BATTING, batter, HITS, 1))
+                if HIT_COLUMNS[event] is not None:
+                    deltas.append((BATTING, batter, HIT_COLUMNS[event], 1))
+            elif event in WALK_EVENTS:
+                deltas.append((BATTING, batter, WALKS, 1))
+            elif event in STRIKEOUT_EVENTS:
+                deltas.append((BATTING, batter, STRIKEOUTS, 1))
+            elif event == "hit_by_pitch":
+                deltas.append((BATTING, batter, HIT_BY_PITCH, 1))
+            if result.get("rbi"):
+                deltas.append((BATTING, batter, RBI, result["rbi"]))
+
+        if pitcher is not None:
+            deltas.append((PITCHING, pitcher, BATTERS_FACED, 1))
+            if event in HIT_COLUMNS:
+                deltas.append((PITCHING, pitcher, HITS_ALLOWED, 1))
+                if event == "home_run":
+                    deltas.append((PITCHING, pitcher, HOME_RUNS_ALLOWED, 1))
+            elif event in WALK_EVENTS:
+                deltas.append((PITCHING, pitcher, WALKS_ALLOWED, 1))
+            elif event in STRIKEOUT_EVENTS:
+                deltas.append((PITCHING, pitcher, STRIKEOUTS_PITCHED, 1))
+
+    if pitcher is not None:
+        pitches = sum(1 for play_event in play.get("playEvents", []) if play_event.get("isPitch"))
+        if pitches:
+            deltas.append((PITCHING, pitcher, PITCHES, pitches))
+
+    involved = {player_id for player_id in (batter, pitcher) if player_id is not None}
+    for runner in play.get("runners", []):
+        details = runner.get("details", {})
+        if runner.get("movement", {}).get("isOut") and pitcher is not None:
+            deltas.append((PITCHING, pitcher, OUTS, 1))
+        if details.get("isScoringEvent"):
+            runner_id = details.get("runner", {}).get("id")
+            charged_to = details.get("responsiblePitcher", {}).get("id") or pitcher
+            if runner_id is not None:
+                deltas.append((BATTING, runner_id, RUNS, 1))
+                involved.add(runner_id)
+            if charged_to is not None:
+                deltas.append((PITCHING, charged_to, RUNS_ALLOWED, 1))
+                if details.get("earned"):
+                    deltas.append((PITCHING, charged_to, EARNED_RUNS, 1))
+
+    key_play = None
+    if event in KEY_EVENTS or about.get("isScoringPlay"):
+        key_play = {
+            "atBatIndex": about.get("atBatIndex"),
+            "inning": about.get("inning"),
+            "halfInning": about.get("halfInning"),
+            "event": result.get("event"),
+            "description": result.get("description"),
+            "awayScore": result.get("awayScore"),
+            "homeScore": result.get("homeScore"),
+            "playerIds": sorted(involved),
+        }
+    return tuple(deltas), key_play
+
+
+def _touched_plays(ops, play_count):
+    """allPlays positions the patch touched, or None if it reshaped the list and everything needs a look."""
+    positions = set()
+    for op in ops:
+        paths = [op["path"]] + ([op["from"]] if "from" in op else [])
+        for path in paths:
+            if path.startswith(ALL_PLAYS_PATH + "/"):
+                token, _, rest = path[len(ALL_PLAYS_PATH) + 1:].partition("/")
+                if token == "-":
+                    positions.add(play_count - 1)
+                    continue
+                position = int(token)
+                # Removing a play, or inserting one anywhere but the end, shifts every later play
+                if not rest and (op["op"] in ("remove", "move") or op["op"] == "add" and position < play_count - 1):
+                    return None
+                positions.add(position)
+            elif ALL_PLAYS_PATH.startswith(path):
+                return None
+    return positions
+
+
+class GameHighlights:
+    """Running batting and pitching lines for everyone in one game, built play by play.
+
+    Lines are small lists of ints indexed by the column constants. Each
+    completed play's contribution is remembered by atBatIndex, so when
+    statsapi corrects a play only the difference is applied, and a patch
+    only costs as much as the plays it touches.
+    """
+
+    def __init__(self, game_pk):
+        self.game_pk = game_pk
+        self.batting = {}
+        self.pitching = {}
+        self.names = {}
+        self.status = None
+        self.timecode = None
+        self.not_found = False
+        self.last_access = time.monotonic()
+        self.plays_processed = 0
+        self._plays = {}
+        self._key_plays = {}
+        self._key_plays_by_player = {}
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def wait_ready(self, timeout):
+        return self._ready.wait(timeout)
+
+    def _apply(self, deltas, sign):
+        tables = (self.batting, self.pitching)
+        widths = (len(BATTING_FIELDS), len(PITCHING_FIELDS))
+        for table, player_id, column, amount in deltas:
+            line = tables[table].get(player_id)
+            if line is None:
+                line = tables[table][player_id] = [0] * widths[table]
+            line[column] += sign * amount
+
+    def _index_key_play(self, key_play, add):
+        index = key_play["atBatIndex"]
+        for player_id in key_play["playerIds"]:
+            indexes = self._key_plays_by_player.setdefault(player_id, set())
+            if add:
+                indexes.add(index)
+            else:
+                indexes.discard(index)
+        if add:
+            self._key_plays[index] = key_play
+        else:
+            self._key_plays.pop(index, None)
+
+    def _set_play(self, index, contribution):
+        old = self._plays.get(index)
+        if old == contribution:
+            return
+        if old is not None:
+            self._apply(old[0], -1)
+            if old[1] is not None:
+                self._index_key_play(old[1], add=False)
+        self._apply(contribution[0], 1)
+        if contribution[1] is not None:
+            self._index_key_play(contribution[1], add=True)
+        self._plays[index] = contribution
+
+    def update(self, feed, ops):
+        """GamePoller listener: fold the plays a snapshot or patch touched into the lines."""
+        if feed is None:
+            # statsapi does not know the game; answer waiters now rather than at their timeout
+            self.not_found = True
+            self._ready.set()
+            return
+        plays = feed.get("liveData", {}).get("plays", {}).get("allPlays", [])
+        positions = None if ops is None else _touched_plays(ops, len(plays))
+
+        with self._lock:
+            if positions is None:
+                positions = range(len(plays))
+                # A full pass may find plays gone, which must be taken back out
+                present = {play.get("about", {}).get("atBatIndex") for play in plays}
+                for index in [index for index in self._plays if index not in present]:
+                    self._set_play(index, ((), None))
+                    del self._plays[index]
+
+            for position in positions:
+                if 0 <= position < len(plays):
+                    play = plays[position]
+                    self._set_play(play.get("about", {}).get("atBatIndex", position), play_contribution(play))
+                    self.plays_processed += 1
+
+            if ops is None or any(op["path"].startswith(PLAYERS_PATH) for op in ops):
+                self.names = {person.get("id"): person.get("fullName")
+                              for person in feed.get("gameData", {}).get("players", {}).values()}
+            self.status = feed.get("gameData", {}).get("status", {}).get("detailedState", self.status)
+            self.timecode = feed.get("metaData", {}).get("timeStamp", self.timecode)
+        self._ready.set()
+
+    def report(self, player_ids):
+        """Lines and key plays for just the given players, as JSON-ready dicts."""
+        with self._lock:
+            players = {}
+            key_play_indexes = set()
+            for player_id in player_ids:
+                batting = self.batting.get(player_id)
+                pitching = self.pitching.get(player_id)
+                if batting is None and pitching is None:
+                    continue
+                entry = {"id": player_id, "fullName": self.names.get(player_id)}
+                if batting is not None:
+                    entry["batting"] = dict(zip(BATTING_FIELDS, batting))
+                if pitching is not None:
+                    entry["pitching"] = dict(zip(PITCHING_FIELDS, pitching))
+                    entry["pitching"]["inningsPitched"] = f"{pitching[OUTS] // 3}.{pitching[OUTS] % 3}"
+                players[player_id] = entry
+                key_play_indexes |= self._key_plays_by_player.get(player_id, set())
+
+            return {
+                "gamePk": self.game_pk,
+                "status": self.status,
+                "timecode": self.timecode,
+                "players": players,
+                "keyPlays": [self._key_plays[index] for index in sorted(key_play_indexes)],
+            }
+
+
+class HighlightsEngine:
+    """Shares one GameHighlights per game between every user who asks about it.
+
+    Games are fed by the live game hub's pollers, so a game that is also
+    being streamed is only polled once. A background sweep drops games
+    left unasked for longer than the idle timeout, and games statsapi
+    does not know, so their pollers stop too.
+    """
+
+    def __init__(self, hub, idle_seconds=HIGHLIGHTS_IDLE_SECONDS, sweep_seconds=HIGHLIGHTS_SWEEP_SECONDS):
+        self.hub = hub
+        self.idle_seconds = idle_seconds
+        self.sweep_seconds = sweep_seconds
+        self._games = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._sweep_loop, name="highlights-sweep", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_seconds):
+            with self._lock:
+                self._drop_idle(time.monotonic())
+
+    def _drop_idle(self, now):
+        for game_pk, game in list(self._games.items()):
+            if now - game.last_access > self.idle_seconds or game.not_found:
+                self.hub.remove_listener(game_pk, game.update)
+                del self._games[game_pk]
+
+    def get(self, game_pk):
+        now = time.monotonic()
+        with self._lock:
+            self._drop_idle(now)
+            game = self._games.get(game_pk)
+            if game is None:
+                game = self._games[game_pk] = GameHighlights(game_pk)
+                self.hub.add_listener(game_pk, game.update)
+            game.last_access = now
+        return game
+
+    def stats(self):
+        with self._lock:
+            return {
+                "games": len(self._games),
+                "playsProcessed": sum(game.plays_processed for game in self._games.values()),
+            }
@@ -0,0 +1,314 @@
+import copy
+import json
+import os
+import queue
+import threading
+
+import metrics
+import upstream
+
+FEED_URL = upstream.STATSAPI_URL + "/api/v1.1/game/{game_pk}/feed/live"
+DIFF_PATCH_URL = upstream.STATSAPI_URL + "/api/v1.1/game/{game_pk}/feed/live/diffPatch?startTimecode={timecode}"
+
+# Fallback poll interval when the feed does not suggest one (seconds)
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", 10))
+# Events buffered per subscriber before a slow client is resynced with a snapshot
+LIVE_SUBSCRIBER_QUEUE = int(os.getenv("LIVE_SUBSCRIBER_QUEUE", 100))
+
+
+def _pointer_tokens(path):
+    if path == "":
+        return []
+    return [token.replace("~1", "/").replace("~0", "~") for token in path.split("/")[1:]]
+
+
+def _resolve(doc, tokens):
+    for token in tokens:
+        doc = doc[int(token)] if isinstance(doc, list) else doc[token]
+    return doc
+
+
+def apply_patch(doc, ops):
+    """Apply RFC 6902 JSON Patch operations to ``doc`` in place and return it."""
+    for op in ops:
+        tokens = _pointer_tokens(op["path"])
+        action = op["op"]
+        if action == "test":
+            continue
+        if action in ("move", "copy"):
+            value = _resolve(doc, _pointer_tokens(op["from"]))
+            if action == "move":
+                apply_patch(doc, [{"op": "remove", "path": op["from"]}])
+            else:
+                value = copy.deepcopy(value)
+            action, op = "add", {"value": value}
+        if not tokens:
+            # Whole-document replacement
+            doc = op["value"]
+            continue
+
+        parent = _resolve(doc, tokens[:-1])
+        key = tokens[-1]
+        if isinstance(parent, list):
+            if action == "add":
+                if key == "-":
+                    parent.append(op["value"])
+                else:
+                    parent.insert(int(key), op["value"])
+            elif action == "replace":
+                parent[int(key)] = op["value"]
+            elif action == "remove":
+                del parent[int(key)]
+        else:
+            if action in ("add", "replace"):
+                parent[key] = op["value"]
+            elif action == "remove":
+                parent.pop(key, None)
+    return doc
+
+
+def _event(name, data):
+    """Encode a Server-Sent Event once so it can be shared by every subscriber."""
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    def __init__(self, game_pk):
+        self.game_pk = game_pk
+        self.events = queue.Queue(maxsize=LIVE_SUBSCRIBER_QUEUE)
+
+    def get(self, timeout=None):
+        return self.events.get(timeout=timeout)
+
+
+class GamePoller:
+    """Polls one game's live feed and fans the changes out to its subscribers.
+
+    The full feed is downloaded once; after that only diffPatch responses
+    since the last timecode are fetched and applied locally. Subscribers
+    receive a snapshot when they join and then just the patch operations.
+    """
+
+    def __init__(self, game_pk):
+        self.game_pk = game_pk
+        self.feed = None
+        self.timecode = None
+        self.subscribers = set()
+        self.listeners = []
+        self.not_found = False
+        self._snapshot_event = None
+        self._snapshot_dirty = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"live-game-{game_pk}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _snapshot(self):
+        """The current feed as a snapshot event, re-encoded only after it changed. Call with the lock held."""
+        if self._snapshot_dirty:
+            self._snapshot_event = _event("snapshot", self.feed)
+            self._snapshot_dirty = False
+        return self._snapshot_event
+
+    def add_subscriber(self, subscription):
+        with self._lock:
+            self.subscribers.add(subscription)
+            snapshot = self._snapshot()
+            if snapshot is not None:
+                subscription.events.put_nowait(snapshot)
+            # The poller has stopped for a finished game, so the final event would never come otherwise
+            if self._is_final():
+                subscription.events.put_nowait(_event("final", {"gamePk": self.game_pk}))
+            elif self.not_found:
+                subscription.events.put_nowait(_event("notFound", {"gamePk": self.game_pk}))
+
+    def remove_subscriber(self, subscription):
+        with self._lock:
+            self.subscribers.discard(subscription)
+
+    def add_listener(self, listener):
+        """Call ``listener(feed, ops)`` after every change; it sees the current feed right away if there is one.
+
+        If statsapi does not know the game, the listener gets ``(None, None)`` once instead.
+        """
+        with self._lock:
+            self.listeners.append(listener)
+            # Patches are applied under the lock, so the feed cannot change under this first call
+            if self.feed is not None:
+                listener(self.feed, None)
+            elif self.not_found:
+                listener(None, None)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def idle(self):
+        """True once nobody is streaming the game and nothing is listening to it."""
+        with self._lock:
+            return not self.subscribers and not self.listeners
+
+    def _broadcast(self, event):
+        with self._lock:
+            self._broadcast_locked(event)
+
+    def _broadcast_locked(self, event):
+        for subscription in self.subscribers:
+            try:
+                subscription.events.put_nowait(event)
+            except queue.Full:
+                # The client fell behind; replace its backlog with the current state
+                while True:
+                    try:
+                        subscription.events.get_nowait()
+                    except queue.Empty:
+                        break
+                subscription.events.put_nowait(self._snapshot())
+
+    def _set_feed_locked(self, feed):
+        self.feed = feed
+        self.timecode = feed.get("metaData", {}).get("timeStamp", self.timecode)
+        self._snapshot_dirty = True
+
+    def _wait_seconds(self):
+        if self.feed is None:
+            return LIVE_POLL_INTERVAL
+        return float(self.feed.get("metaData", {}).get("wait", LIVE_POLL_INTERVAL))
+
+    def _is_final(self):
+        return self.feed is not None and \
+            self.feed.get("gameData", {}).get("status", {}).get("abstractGameState") == "Final"
+
+    def _notify_listeners(self, ops):
+        for listener in list(self.listeners):
+            try:
+                listener(self.feed, ops)
+            except Exception as e:
+                print(f"Error in live feed listener for game {self.game_pk}: {e}")
+
+    def _publish_feed(self, feed):
+        """Swap in a whole new feed and send it to everyone as a snapshot."""
+        with self._lock:
+            self._set_feed_locked(feed)
+            self._broadcast_locked(self._snapshot())
+        self._notify_listeners(None)
+
+    def poll_once(self):
+        """Bring the feed up to date; returns True if anything changed."""
+        if self.feed is None:
+            # Upstream bodies may be shared, and patches edit the feed in place
+            self._publish_feed(copy.deepcopy(upstream.fetch_json(FEED_URL.format(game_pk=self.game_pk), fallback=False)))
+            return True
+
+        # Diffs are keyed by timecode, so an old body is never a useful fallback
+        try:
+            data = upstream.fetch_json(DIFF_PATCH_URL.format(game_pk=self.game_pk, timecode=self.timecode),
+                                       fallback=False)
+        except upstream.SnapshotMissing:
+            # A replay only has the diffs the recording poller asked for; move on with the recorded full feed
+            data = upstream.fetch_json(FEED_URL.format(game_pk=self.game_pk), fallback=False)
+            if data.get("metaData", {}).get("timeStamp") == self.timecode:
+                return False
+
+        if isinstance(data, dict):
+            # Too much changed for a diff, so statsapi sent the whole feed again
+            self._publish_feed(copy.deepcopy(data))
+            return True
+
+        ops = [op for patch in data for op in patch.get("diff", [])]
+        if not ops:
+            return False
+
+        event = _event("patch", ops)
+        # One lock hold, so a subscriber joining now gets either the old snapshot and this patch or the new snapshot
+        with self._lock:
+            try:
+                feed = apply_patch(self.feed, ops)
+            except (KeyError, IndexError, ValueError, TypeError):
+                # Our copy drifted from upstream; start over from a full download
+                self.feed = None
+                raise
+            self._set_feed_locked(feed)
+            self._broadcast_locked(event)
+        self._notify_listeners(ops)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                if isinstance(e, upstream.UpstreamError) and e.status_code == 404 and self.feed is None:
+                    # No such game; it will never reach Final, so stop asking
+                    with self._lock:
+                        self.not_found = True
+                        self._broadcast_locked(_event("notFound", {"gamePk": self.game_pk}))
+                    self._notify_listeners(None)
+                    break
+                metrics.background_errors.inc("live_poll")
+                print(f"Error polling live feed for game {self.game_pk}: {e}")
+
+            if self._is_final():
+                self._broadcast(_event("final", {"gamePk": self.game_pk}))
+                break
+            self._stop.wait(self._wait_seconds())
+
+
+class LiveGameHub:
+    """One poller per active game, started by the first subscriber and stopped by the last."""
+
+    def __init__(self):
+        self._pollers = {}
+        self._lock = threading.Lock()
+
+    def _poller(self, game_pk):
+        """The game's poller, started if it is not running yet. Call with the lock held."""
+        poller = self._pollers.get(game_pk)
+        if poller is None:
+            poller = GamePoller(game_pk)
+            self._pollers[game_pk] = poller
+            poller.start()
+        return poller
+
+    def _release(self, game_pk, poller):
+        """Stop a poller nobody needs anymore. Call with the lock held."""
+        if poller.idle():
+            poller.stop()
+            del self._pollers[game_pk]
+
+    def subscribe(self, game_pk):
+        subscription = Subscription(game_pk)
+        with self._lock:
+            self._poller(game_pk).add_subscriber(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            poller = self._pollers.get(subscription.game_pk)
+            if poller is None:
+                return
+            poller.remove_subscriber(subscription)
+            self._release(subscription.game_pk, poller)
+
+    def add_listener(self, game_pk, listener):
+        """Feed a game's changes to ``listener(feed, ops)``, polling the game if nobody else is."""
+        with self._lock:
+            self._poller(game_pk).add_listener(listener)
+
+    def remove_listener(self, game_pk, listener):
+        with self._lock:
+            poller = self._pollers.get(game_pk)
+            if poller is None:
+                return
+            poller.remove_listener(listener)
+            self._release(game_pk, poller)
+
+    def active_games(self):
+        with self._lock:
+            return {game_pk: len(poller.subscribers) for game_pk, poller in self._pollers.items()}
@@ -0,0 +1,265 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Latency buckets in seconds, from a warm cache hit up to a slow upstream call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, one value per label combination."""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout, one series per label combination."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - started)
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                label_text = _format_labels(self.labelnames, labels, [("le", _format_value(float(bound)))])
+                yield f"{self.name}_bucket{label_text} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(values[-1])}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Registry:
+    """Named metrics plus collectors that read gauges from other components at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """Add a callable returning ``[(name, type, help, [(labels dict, value), ...]), ...]``."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                # One broken collector should not blank the whole scrape
+                print(f"Error collecting metrics: {e}")
+                continue
+            for name, metric_type, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    label_text = _format_labels(labels.keys(), labels.values())
+                    lines.append(f"{name}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "stathub_http_requests_total", "HTTP requests by route template, method and status.",
+    ("route", "method", "status"))
+http_request_duration = registry.histogram(
+    "stathub_http_request_duration_seconds", "Time to produce a response, by route template and method.",
+    ("route", "method"))
+db_query_duration = registry.histogram(
+    "stathub_db_query_duration_seconds", "Database statement execution time, by statement name.",
+    ("statement",))
+db_query_errors = registry.counter(
+    "stathub_db_query_errors_total", "Database statements that raised, by statement name.",
+    ("statement",))
+upstream_request_duration = registry.histogram(
+    "stathub_upstream_request_duration_seconds",
+    "Time per upstream HTTP attempt, by endpoint template and outcome (status code or error).",
+    ("endpoint", "outcome"))
+background_errors = registry.counter(
+    "stathub_background_errors_total", "Errors swallowed by background refreshes and pollers, by component.",
+    ("component",))
+
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=[/.]|$)")
+
+
+def endpoint_template(url):
+    """Collapse a concrete upstream URL to a low-cardinality label.
+
+    ``https://statsapi.mlb.com/api/v1/teams/147/roster?season=2024``
+    becomes ``statsapi.mlb.com/api/v1/teams/{id}/roster``, and a headshot
+    URL ends in ``/{id}.jpg``.
+    """
+    parts = urlsplit(url)
+    return parts.netloc + _NUMERIC_SEGMENT.sub("/{id}", parts.path)
+
+
+def statement_name(sql):
+    """Fallback name for an unnamed statement: its verb and first table, e.g. ``select user_data``."""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    verb = re.search(r"\b(select|insert|update|delete)\b", sql, re.IGNORECASE)
+    table = re.search(r"\b(?:from|into|update)\s+(\w+)", sql, re.IGNORECASE)
+    if verb is None or table is None:
+        return "other"
+    return f"{verb.group(1).lower()} {table.group(1)}"
+
+
+def cache_collector(caches):
+    """Collector for TTLCache-style ``stats()`` dicts, given ``{cache name: stats callable}``."""
+
+    def collect():
+        requests = []
+        ratios = []
+        sizes = []
+        evictions = []
+        for name, stats in caches.items():
+            values = stats()
+            hits = values.get("hits", 0)
+            stale = values.get("staleHits", 0)
+            misses = values.get("misses", 0)
+            requests.append(({"cache": name, "result": "hit"}, hits))
+            if "staleHits" in values:
+                requests.append(({"cache": name, "result": "stale"}, stale))
+            requests.append(({"cache": name, "result": "miss"}, misses))
+            total = hits + stale + misses
+            ratios.append(({"cache": name}, round((hits + stale) / total, 6) if total else 0))
+            size = values.get("size", values.get("bytes"))
+            if size is not None:
+                sizes.append(({"cache": name}, size))
+            evictions.append(({"cache": name}, values.get("evictions", 0)))
+        return [
+            ("stathub_cache_requests_total", "counter", "Cache lookups by result.", requests),
+            ("stathub_cache_hit_ratio", "gauge", "Share of lookups served from cache since start.", ratios),
+            ("stathub_cache_size", "gauge", "Entries (or bytes, for disk caches) currently held.", sizes),
+            ("stathub_cache_evictions_total", "counter", "Entries evicted to stay within the cache bound.",
+             evictions),
+        ]
+
+    return collect
+
+
+def instrument(app, profiler=None):
+    """Time every Flask request and count it by route template, method and status.
+
+    When a profiler is given, each request is sampled by it and slow
+    ones are dumped.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        if profiler is not None:
+            profiler.begin()
+
+    @app.after_request
+    def _record(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            http_request_duration.observe(route, request.method, value=elapsed)
+            http_requests.inc(route, request.method, str(response.status_code))
+            if profiler is not None:
+                profiler.end(f"{request.method} {route}", elapsed)
+        return response
+
+    @app.teardown_request
+    def _discard(exc):
+        # Requests that raised past after_request still have to leave the profiler
+        if profiler is not None:
+            profiler.cancel()
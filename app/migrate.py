@@ -0,0 +1,54 @@
+import os
+import sys
+
+import psycopg2
+from dotenv import load_dotenv
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def pending_migrations(applied):
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        if name.endswith(".sql") and name not in applied:
+            yield name
+
+
+def migrate(url):
+    """Apply every migrations/*.sql file that has not run yet, in name order."""
+    connection = psycopg2.connect(url)
+    try:
+        cur = connection.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                name TEXT PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """)
+        connection.commit()
+
+        cur.execute("SELECT name FROM schema_migrations;")
+        applied = {row[0] for row in cur.fetchall()}
+
+        for name in pending_migrations(applied):
+            with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                sql = f.read()
+            # Each file runs in its own transaction together with its bookkeeping row
+            cur.execute(sql)
+            cur.execute("INSERT INTO schema_migrations (name) VALUES (%s);", (name,))
+            connection.commit()
+            print(f"Applied {name}")
+
+        cur.close()
+    except psycopg2.Error:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        sys.exit("DATABASE_URL is not set")
+    migrate(url)
@@ -0,0 +1,27 @@
+-- One row per follow instead of an INTEGER[] on user_data
+CREATE TABLE IF NOT EXISTS user_players (
+    user_id INTEGER NOT NULL REFERENCES user_data (id) ON DELETE CASCADE,
+    player_id INTEGER NOT NULL,
+    added_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, player_id)
+);
+
+-- Newest-first follow list for a user
+CREATE INDEX IF NOT EXISTS user_players_user_added_idx ON user_players (user_id, added_at DESC);
+
+-- Reverse lookups: who follows player X
+CREATE INDEX IF NOT EXISTS user_players_player_idx ON user_players (player_id);
+
+-- Carry over existing follows. The arrays only kept one added_at per user,
+-- so array position is used to keep the original order within a user.
+INSERT INTO user_players (user_id, player_id, added_at)
+SELECT u.id,
+       f.player_id,
+       COALESCE(u.added_at, NOW()) - (cardinality(u.player_id) - f.ord) * INTERVAL '1 millisecond'
+FROM user_data u
+CROSS JOIN LATERAL unnest(u.player_id) WITH ORDINALITY AS f (player_id, ord)
+WHERE u.player_id IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+-- user_data.player_id and user_data.added_at are left in place so the
+-- previous release can still be rolled back to; drop them once it is retired.
@@ -0,0 +1,7 @@
+-- Local copy of the projected player profiles served by /player/<id>
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    profile JSONB NOT NULL,
+    last_season INTEGER,
+    synced_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
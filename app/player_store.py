@@ -0,0 +1,74 @@
+import psycopg2
+import requests
+from psycopg2.extras import Json, execute_values
+
+import upstream
+from players import PlayerProfile
+
+SPORT_PLAYERS_URL = upstream.STATSAPI_URL + "/api/v1/sports/1/players?season={season}"
+
+
+class PlayerStore:
+    """Projected player profiles kept in the local players table."""
+
+    def __init__(self, db_pool):
+        self.db_pool = db_pool
+
+    def get_many(self, player_ids):
+        """Stored profiles for the given ids, as {player_id: PlayerProfile}."""
+        if not player_ids:
+            return {}
+        with self.db_pool.connection() as connection:
+            cur = connection.cursor()
+            cur.execute("""
+                SELECT id, profile
+                FROM players
+                WHERE id = ANY(%s);
+            """, (list(player_ids),), name="players_select")
+            rows = cur.fetchall()
+            cur.close()
+        return {row[0]: PlayerProfile.from_dict(row[1]) for row in rows}
+
+    def save(self, profiles, season=None):
+        """Upsert profiles, touching only rows whose data actually changed.
+
+        Returns the number of rows inserted or updated.
+        """
+        if not profiles:
+            return 0
+        rows = [(profile.id, Json(profile.to_dict()), season) for profile in profiles]
+        with self.db_pool.connection() as connection:
+            cur = connection.cursor()
+            returned = execute_values(cur, """
+                INSERT INTO players (id, profile, last_season)
+                VALUES %s
+                ON CONFLICT (id) DO UPDATE
+                SET profile = EXCLUDED.profile,
+                    last_season = GREATEST(players.last_season, EXCLUDED.last_season),
+                    synced_at = NOW()
+                WHERE players.profile IS DISTINCT FROM EXCLUDED.profile
+                   OR players.last_season IS DISTINCT FROM GREATEST(players.last_season, EXCLUDED.last_season)
+                RETURNING id;
+            """, rows, page_size=500, fetch=True)
+            # One statement runs per page, so rowcount would only cover the last one
+            changed = len(returned)
+            connection.commit()
+            cur.close()
+        return changed
+
+    def sync_season(self, season):
+        """Bulk-load every player statsapi lists for a season; returns (players seen, rows changed)."""
+        data = upstream.fetch_json(SPORT_PLAYERS_URL.format(season=season), fallback=False)
+        profiles = [PlayerProfile.from_person(player) for player in data.get("people", [])
+                    if player.get("id") is not None]
+        return len(profiles), self.save(profiles, season)
+
+    def sync(self, seasons):
+        """Sync several seasons oldest first, so the newest data wins."""
+        results = {}
+        for season in sorted(seasons):
+            try:
+                results[season] = self.sync_season(season)
+            except (psycopg2.Error, requests.exceptions.RequestException) as e:
+                print(f"Error syncing {season} players: {e}")
+        return results
@@ -0,0 +1,172 @@
+import os
+
+import fastjson
+import upstream
+from cache import TTLCache
+from fastjson import Encoded
+
+PEOPLE_BATCH_URL = upstream.STATSAPI_URL + "/api/v1/people?personIds={person_ids}"
+
+# Ids per upstream personIds= request; keeps the query string a sane length
+PEOPLE_BATCH_SIZE = int(os.getenv("PEOPLE_BATCH_SIZE", 50))
+
+# Bio data barely changes, so profiles can live for a day
+PLAYER_CACHE_SIZE = int(os.getenv("PLAYER_CACHE_SIZE", 5000))
+PLAYER_CACHE_TTL = int(os.getenv("PLAYER_CACHE_TTL", 24 * 3600))
+
+
+# Served profile fields: (attribute, JSON key)
+PROFILE_FIELDS = (
+    ("id", "id"),
+    ("full_name", "fullName"),
+    ("primary_number", "primaryNumber"),
+    ("birth_date", "birthDate"),
+    ("current_age", "currentAge"),
+    ("birth_city", "birthCity"),
+    ("birth_country", "birthCountry"),
+    ("height", "height"),
+    ("weight", "weight"),
+    ("primary_position", "primaryPosition"),
+    ("nick_name", "nickName"),
+    ("mlb_debut_date", "mlbDebutDate"),
+    ("bat_side", "batSide"),
+    ("pitch_hand", "pitchHand"),
+    ("strike_zone_top", "strikeZoneTop"),
+    ("strike_zone_bottom", "strikeZoneBottom"),
+)
+
+
+class PlayerProfile(Encoded):
+    """The profile fields we serve for one player, in slots rather than a dict.
+
+    Profiles are shared by every request through the profile cache, so
+    they are treated as read-only; that is what lets the JSON be encoded
+    once, on first use, and reused for every response after.
+    """
+
+    __slots__ = tuple(attribute for attribute, _ in PROFILE_FIELDS) + ("_json",)
+
+    def __init__(self, *values):
+        for (attribute, _), value in zip(PROFILE_FIELDS, values):
+            setattr(self, attribute, value)
+        self._json = None
+
+    @classmethod
+    def from_person(cls, player):
+        """Pick the profile fields out of a statsapi person."""
+        return cls(
+            player.get("id"),
+            player.get("fullName"),
+            player.get("primaryNumber"),
+            player.get("birthDate"),
+            player.get("currentAge"),
+            player.get("birthCity"),
+            player.get("birthCountry"),
+            player.get("height"),
+            player.get("weight"),
+            player.get("primaryPosition", {}).get("name"),
+            player.get("nickName", "N/A"),
+            player.get("mlbDebutDate", "N/A"),
+            player.get("batSide", {}).get("description"),
+            player.get("pitchHand", {}).get("description"),
+            player.get("strikeZoneTop"),
+            player.get("strikeZoneBottom"),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a profile from its to_dict() form, as kept in the players table."""
+        return cls(*(data.get(key) for _, key in PROFILE_FIELDS))
+
+    def to_dict(self):
+        return {key: getattr(self, attribute) for attribute, key in PROFILE_FIELDS}
+
+    def json_bytes(self):
+        if self._json is None:
+            self._json = fastjson.dumps(self.to_dict())
+        return self._json
+
+    def __repr__(self):
+        return f"PlayerProfile(id={self.id!r}, full_name={self.full_name!r})"
+
+
+# Optional local PlayerStore consulted before statsapi, set with use_store()
+_store = None
+
+
+def use_store(store):
+    global _store
+    _store = store
+
+
+def load_player(player_id):
+    """One profile from the local store, else from statsapi; None if nobody has it."""
+    return load_players_by_id([player_id]).get(player_id)
+
+
+def load_players_by_id(player_ids):
+    """Profiles from the local store, with statsapi only for ids the store does not know."""
+    profiles = {}
+    if _store is not None:
+        try:
+            profiles = _store.get_many(player_ids)
+        except Exception as e:
+            print(f"Error reading player profiles: {e}")
+    unknown = [player_id for player_id in player_ids if player_id not in profiles]
+    if unknown:
+        fetched = fetch_players(unknown)
+        profiles.update(fetched)
+        if _store is not None and fetched:
+            try:
+                _store.save(list(fetched.values()))
+            except Exception as e:
+                # The profiles are still served; the nightly sync will catch up
+                print(f"Error saving player profiles: {e}")
+    return profiles
+
+
+def fetch_players(player_ids):
+    """Fetch several profiles with batched personIds= requests.
+
+    Batches run in parallel. Returns {player_id: profile} for the ids
+    statsapi knows; anything else is simply absent from the result. If a
+    batch fails the error is raised, since its ids are not known to be
+    missing.
+    """
+    player_ids = list(dict.fromkeys(player_ids))
+    batches = [player_ids[i:i + PEOPLE_BATCH_SIZE] for i in range(0, len(player_ids), PEOPLE_BATCH_SIZE)]
+    urls = [PEOPLE_BATCH_URL.format(person_ids=",".join(str(player_id) for player_id in batch)) for batch in batches]
+
+    profiles = {}
+    for data in upstream.fetch_json_many(urls):
+        if isinstance(data, Exception):
+            raise data
+        for player in data.get("people", []):
+            if player.get("id") is not None:
+                profiles[player["id"]] = PlayerProfile.from_person(player)
+    return profiles
+
+
+profile_cache = TTLCache(load_player, max_entries=PLAYER_CACHE_SIZE, ttl=PLAYER_CACHE_TTL)
+
+
+def get_player(player_id):
+    """Cached profile for one player, or None if statsapi does not know them."""
+    return profile_cache.get(player_id)
+
+
+def load_players(player_ids):
+    """Cached profiles for several players.
+
+    Returns (profiles, missing): profiles in the order given and the ids
+    statsapi had nothing for. Raises when statsapi could not be asked.
+    """
+    found = profile_cache.get_many(player_ids, load_players_by_id)
+    profiles = [found[player_id] for player_id in player_ids if player_id in found]
+    missing = [player_id for player_id in player_ids if player_id not in found]
+    return profiles, missing
+
+
+def get_players(player_ids):
+    """Cached profiles for several players, in the order given; unknown ids are skipped."""
+    return load_players(player_ids)[0]
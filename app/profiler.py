@@ -0,0 +1,111 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# Requests slower than this get their sampled stacks written out (milliseconds, 0 disables)
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", 0))
+# Time between stack samples (seconds)
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "profiles"))
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _collapse(frame):
+    """Root-first ``a;b;c`` stack, the collapsed format flamegraph.pl and speedscope read."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """Samples the stacks of threads serving requests and keeps the ones that turn out slow.
+
+    One background thread wakes every ``interval`` and records the
+    current stack of each thread between ``begin`` and ``end``. Only
+    requests that took at least ``threshold_ms`` are written, one
+    collapsed-stack file each, so normal traffic costs a dict update.
+    """
+
+    def __init__(self, threshold_ms=PROFILE_SLOW_REQUEST_MS, interval=PROFILE_SAMPLE_INTERVAL,
+                 output_dir=PROFILE_DIR):
+        self.threshold_ms = threshold_ms
+        self.interval = interval
+        self.output_dir = output_dir
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.dumped = 0
+
+    @property
+    def enabled(self):
+        return self.threshold_ms > 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    os.makedirs(self.output_dir, exist_ok=True)
+                    self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                    self._thread.start()
+
+    def _sample_loop(self):
+        sampler_id = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                thread_ids = list(self._active)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == sampler_id:
+                    continue
+                stack = _collapse(frame)
+                with self._lock:
+                    samples = self._active.get(thread_id)
+                    if samples is not None:
+                        samples[stack] += 1
+
+    def begin(self):
+        if not self.enabled:
+            return
+        self._ensure_started()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def cancel(self):
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def end(self, label, elapsed):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if samples and elapsed * 1000 >= self.threshold_ms:
+            self._dump(label, elapsed, samples)
+
+    def _dump(self, label, elapsed, samples):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_")
+        name = f"{datetime.now().strftime('%Y%m%dT%H%M%S.%f')}-{int(elapsed * 1000)}ms-{slug}.folded"
+        try:
+            with open(os.path.join(self.output_dir, name), "w") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.dumped += 1
+        except OSError as e:
+            print(f"Error writing profile: {e}")
+
+    def stats(self):
+        with self._lock:
+            active = len(self._active)
+        return {"thresholdMs": self.threshold_ms, "active": active, "dumped": self.dumped}
@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Per-host breaker: opens after consecutive failures, then lets one probe through.
+
+    While open, ``allow`` refuses calls until ``reset_timeout`` has passed.
+    The next caller becomes the half-open probe; its success closes the
+    breaker and its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutiveFailures": self.failures,
+                "timesOpened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent traffic so retries cannot snowball.
+
+    Every request deposits ``ratio`` tokens and every retry spends one.
+    A small per-second trickle keeps retries possible when traffic is low.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, max_tokens=20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.granted = 0
+        self.denied = 0
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount):
+        now = time.monotonic()
+        amount += (now - self._updated_at) * self.min_per_second
+        self._updated_at = now
+        self.tokens = min(self.max_tokens, self.tokens + amount)
+
+    def record_request(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            self._refill(0)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.granted += 1
+                return True
+            self.denied += 1
+            return False
+
+    def stats(self):
+        with self._lock:
+            return {"tokens": round(self.tokens, 2), "granted": self.granted, "denied": self.denied}
+
+
+def backoff_delay(attempt, base=0.2, cap=2.0):
+    """Full-jitter exponential backoff for the given retry attempt (1-based)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
@@ -0,0 +1,97 @@
+import os
+import threading
+from datetime import datetime
+
+import requests
+
+import metrics
+import upstream
+
+TEAMS_URL = upstream.STATSAPI_URL + '/api/v1/teams?sportId=1&season={season}'
+ROSTER_URL = upstream.STATSAPI_URL + '/api/v1/teams/{team_id}/roster?season={season}'
+
+# How often the background thread rebuilds the current season (seconds)
+ROSTER_REFRESH_INTERVAL = int(os.getenv("ROSTER_REFRESH_INTERVAL", 6 * 3600))
+
+
+class RosterIndex:
+    """In-memory player id -> (team name, team id) index, one dict per season."""
+
+    def __init__(self, refresh_interval=ROSTER_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._seasons = {}
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def build(self, season):
+        """Walk every team roster once and swap in the new index for the season."""
+        # That season's clubs and names, which differ from today's for past seasons
+        teams = upstream.fetch_json(TEAMS_URL.format(season=season)).get("teams", [])
+
+        roster_urls = [ROSTER_URL.format(team_id=team["id"], season=season) for team in teams]
+        rosters = upstream.fetch_json_many(roster_urls)
+
+        index = {}
+        for team, roster in zip(teams, rosters):
+            if isinstance(roster, Exception):
+                raise roster
+            for player_entry in roster.get("roster", []):
+                player_id = player_entry.get("person", {}).get("id")
+                if player_id is not None:
+                    index[player_id] = (team["name"], team["id"])
+
+        with self._lock:
+            self._seasons[season] = index
+        return index
+
+    def ensure(self, season):
+        """Return the index for a season, building it once if it has never been loaded."""
+        index = self._seasons.get(season)
+        if index is not None:
+            return index
+
+        # Only one request builds a cold season; the rest wait for its result
+        with self._build_lock(season):
+            index = self._seasons.get(season)
+            if index is None:
+                index = self.build(season)
+            return index
+
+    def _build_lock(self, season):
+        with self._lock:
+            return self._build_locks.setdefault(season, threading.Lock())
+
+    def lookup(self, player_id, season=None):
+        """Find the team a player is rostered on, or (None, None)."""
+        season = season or datetime.now().year
+        try:
+            index = self.ensure(season)
+        except requests.exceptions.RequestException as e:
+            metrics.background_errors.inc("roster_lookup")
+            print(f"Error fetching team/roster: {e}")
+            return None, None
+        return index.get(player_id, (None, None))
+
+    def start(self):
+        """Refresh the current season in the background on a fixed schedule."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name="roster-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            season = datetime.now().year
+            try:
+                with self._build_lock(season):
+                    self.build(season)
+            except requests.exceptions.RequestException as e:
+                # Keep serving the previous index until the next attempt
+                metrics.background_errors.inc("roster_refresh")
+                print(f"Error refreshing roster index: {e}")
+            self._stop.wait(self.refresh_interval)
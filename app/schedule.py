@@ -0,0 +1,152 @@
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+import metrics
+import upstream
+
+SCHEDULE_URL = upstream.STATSAPI_URL + "/api/v1/schedule?sportId=1&season={season}"
+
+# How long the current season's schedule is served before a background reload (seconds)
+SCHEDULE_REFRESH_INTERVAL = int(os.getenv("SCHEDULE_REFRESH_INTERVAL", 15 * 60))
+
+# Column positions in the per-game tuples
+GAME_PK, OFFICIAL_DATE, GAME_DATE, STATUS, AWAY_ID, AWAY_NAME, HOME_ID, HOME_NAME = range(8)
+
+
+class SeasonSchedule:
+    """One season's games as compact tuples, sorted by date, with lookup indexes.
+
+    ``dates`` runs parallel to ``games`` so a date range is two bisects.
+    ``by_team`` holds each team's game positions in ascending order, and
+    ``by_pk`` maps a gamePk to its position.
+    """
+
+    def __init__(self, season, games):
+        self.season = season
+        self.loaded_at = time.monotonic()
+        self.games = sorted(games, key=lambda game: (game[OFFICIAL_DATE], game[GAME_DATE], game[GAME_PK]))
+        self.dates = [game[OFFICIAL_DATE] for game in self.games]
+        self.by_pk = {}
+        self.by_team = {}
+        for position, game in enumerate(self.games):
+            self.by_pk[game[GAME_PK]] = position
+            self.by_team.setdefault(game[AWAY_ID], []).append(position)
+            self.by_team.setdefault(game[HOME_ID], []).append(position)
+
+    @classmethod
+    def from_response(cls, season, data):
+        games = []
+        for date in data.get("dates", []):
+            for game in date.get("games", []):
+                teams = game.get("teams", {})
+                away = teams.get("away", {}).get("team", {})
+                home = teams.get("home", {}).get("team", {})
+                games.append((
+                    game["gamePk"],
+                    game.get("officialDate", date.get("date")),
+                    game.get("gameDate"),
+                    game.get("status", {}).get("detailedState"),
+                    away.get("id"),
+                    away.get("name"),
+                    home.get("id"),
+                    home.get("name"),
+                ))
+        return cls(season, games)
+
+    def query(self, start=None, end=None, team_ids=None):
+        """Positions of the games between two YYYY-MM-DD dates (inclusive), optionally for some teams."""
+        lo = bisect_left(self.dates, start) if start else 0
+        hi = bisect_right(self.dates, end) if end else len(self.games)
+
+        if not team_ids:
+            return range(lo, hi)
+
+        # Each team list is already sorted, so narrowing to the date range is two more bisects
+        team_slices = []
+        for team_id in team_ids:
+            positions = self.by_team.get(team_id, [])
+            team_slices.append(positions[bisect_left(positions, lo):bisect_left(positions, hi)])
+
+        matches = []
+        for position in heapq.merge(*team_slices):
+            # Games between two requested teams show up in both lists
+            if not matches or matches[-1] != position:
+                matches.append(position)
+        return matches
+
+    def game(self, game_pk):
+        position = self.by_pk.get(game_pk)
+        return None if position is None else self.games[position]
+
+
+def game_to_json(game):
+    return {
+        "gamePk": game[GAME_PK],
+        "officialDate": game[OFFICIAL_DATE],
+        "gameDate": game[GAME_DATE],
+        "status": game[STATUS],
+        "away": {"id": game[AWAY_ID], "name": game[AWAY_NAME]},
+        "home": {"id": game[HOME_ID], "name": game[HOME_NAME]},
+    }
+
+
+class ScheduleStore:
+    """Season schedules loaded once each.
+
+    Past seasons never change and are kept for good. The current season
+    is reloaded in the background once it is older than the refresh
+    interval, while the previous copy keeps serving.
+    """
+
+    def __init__(self, refresh_interval=SCHEDULE_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._seasons = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._refreshing = set()
+
+    def _load_lock(self, season):
+        with self._lock:
+            return self._load_locks.setdefault(season, threading.Lock())
+
+    def load(self, season):
+        # A whole season is large, and the previous copy keeps serving if a reload fails
+        data = upstream.fetch_json(SCHEDULE_URL.format(season=season), fallback=False)
+        schedule = SeasonSchedule.from_response(season, data)
+        with self._lock:
+            self._seasons[season] = schedule
+        return schedule
+
+    def _refresh(self, season):
+        try:
+            with self._load_lock(season):
+                self.load(season)
+        except Exception as e:
+            metrics.background_errors.inc("schedule_refresh")
+            print(f"Error refreshing {season} schedule: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(season)
+
+    def get(self, season):
+        schedule = self._seasons.get(season)
+        if schedule is None:
+            # Only one request downloads a cold season; the rest wait for it
+            with self._load_lock(season):
+                schedule = self._seasons.get(season)
+                if schedule is None:
+                    schedule = self.load(season)
+            return schedule
+
+        is_current = season >= datetime.now().year
+        if is_current and time.monotonic() - schedule.loaded_at > self.refresh_interval:
+            with self._lock:
+                start_refresh = season not in self._refreshing
+                self._refreshing.add(season)
+            if start_refresh:
+                threading.Thread(target=self._refresh, args=(season,), name=f"schedule-{season}", daemon=True).start()
+        return schedule
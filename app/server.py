@@ -1,73 +1,159 @@
-from flask import Flask, jsonify, request
-import requests
+from flask import Blueprint, Flask, Response, g, jsonify, request, send_file, url_for
 from flask_cors import CORS
-from flask_bcrypt import Bcrypt, check_password_hash, generate_password_hash
 import psycopg2
 import os
+import queue
+import requests
 from dotenv import load_dotenv
 import jwt
-from datetime import datetime, timezone, timedelta
+from datetime import datetime
 
+# Load .env before the local modules read their settings
 load_dotenv()
 
-app = Flask(__name__)
-
-# Database connection
+import fastjson
+import metrics
+import players
+import upstream
+import user_changes
+from auth import Authenticator
+from db import ConnectionPool
+from hashing import HashPoolFull, PasswordHasher
+from game_logs import GameLogStore, aggregate
+from headshots import VARIANTS, HeadshotCache
+from highlights import HighlightsEngine
+from live_games import LiveGameHub
+from player_store import PlayerStore
+from profiler import SlowRequestProfiler
+from roster_index import RosterIndex
+from schedule import ScheduleStore, game_to_json
+from user_changes import UserChangeListener
+from warmup import WARM_UP, WARM_UP_PLAYERS, WarmUp
+
+# Routes live on a blueprint so create_app() can build the app without side effects at import
+api = Blueprint("api", __name__)
+
+# Stacks of slow requests are dumped when PROFILE_SLOW_REQUEST_MS is set
+slow_request_profiler = SlowRequestProfiler()
+
+# Database connection pool, connected on first use; each request checks out its own connection
 url = os.getenv('DATABASE_URL')
-connection = psycopg2.connect(url)
+db_pool = ConnectionPool(url)
+
+# Player profiles come from the locally synced table first, statsapi second
+players.use_store(PlayerStore(db_pool))
 
-# JWT configuration
+# JWT configuration; verified tokens are cached until they expire
 SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-TOKEN_EXPIRATION_TIME = 3600
+auth = Authenticator(SECRET_KEY, db_pool)
+
+# Follow-list and preference writes are announced over LISTEN/NOTIFY so every worker drops its cached copy
+user_change_listener = UserChangeListener(url)
+user_change_listener.subscribe(auth.invalidate_user, on_reset=auth.users.clear)
+
+# Upper bound on ids accepted by the batch player endpoint
+MAX_PLAYERS_PER_REQUEST = 200
+
+# Sections /user/dashboard can return
+DASHBOARD_FIELDS = {"players", "teams", "images", "preference"}
+
+# Encryption; bcrypt runs in a worker process pool off the request threads
+password_hasher = PasswordHasher()
+
+# Player -> team lookup, refreshed in the background so trades show up
+roster_index = RosterIndex()
+
+# One upstream poller per watched game, shared by every browser streaming it
+live_game_hub = LiveGameHub()
+# Comment line sent on idle streams so proxies do not close them (seconds)
+STREAM_KEEPALIVE_SECONDS = 15
+
+# Followed-player lines per game, fed by the same pollers as the streams
+highlights_engine = HighlightsEngine(live_game_hub)
+# How long a highlights request waits for a cold game's first feed (seconds)
+HIGHLIGHTS_WAIT_SECONDS = 10
+
+# Headshots proxied through a local disk cache; browsers may reuse them for a week
+headshot_cache = HeadshotCache()
+HEADSHOT_MAX_AGE = 7 * 24 * 3600
+
+# Per player-season game logs in NumPy columns, for the followed-player stat lines
+game_log_store = GameLogStore()
+STATS_DEFAULT_WINDOWS = (7, 15)
+STATS_MAX_WINDOWS = 4
+
+# Season schedules indexed by date, team and gamePk
+schedule_store = ScheduleStore()
+SCHEDULE_DEFAULT_PAGE_SIZE = 100
+SCHEDULE_MAX_PAGE_SIZE = 500
+
+# Seasons accepted by season-keyed routes; each one asked for is downloaded and kept, so unknown years are refused
+FIRST_SEASON = 1876
+
 
-# Encryption
-bcrypt = Bcrypt(app)
+def valid_season(season):
+    return FIRST_SEASON <= season <= datetime.now().year + 1
 
-# (CORS) configuration
-CORS(app, supports_credentials=True)
+metrics.registry.register_collector(metrics.cache_collector({
+    "players": players.profile_cache.stats,
+    "headshots": headshot_cache.stats,
+    "users": auth.users.stats,
+}))
 
-@app.route('/player/<int:player_id>', methods=['GET'])
+
+def player_data_unavailable(e):
+    """503 for when statsapi could not be asked about some players, so they can't be called missing"""
+    return jsonify({"error": f"Player data unavailable: {e}"}), 503, {"Retry-After": "5"}
+
+
+def json_response(value, status=200):
+    """JSON response that sends cached player profiles' pre-encoded bytes instead of re-encoding them"""
+    return Response(fastjson.encode(value), status=status, content_type="application/json")
+
+
+@api.route('/player/<int:player_id>', methods=['GET'])
 def get_player_data(player_id):
     try:
-        # Fetch data from the MLB API
-        api_url = f"https://statsapi.mlb.com/api/v1/people/{player_id}/"
-        response = requests.get(api_url)
+        # Served from the profile cache, falling back to the MLB API
+        player_data = players.get_player(player_id)
 
-        if response.status_code != 200:
+        if player_data is None:
             return jsonify({"error": "Player not found"}), 404
 
-        data = response.json()
-
-        # Extract player information
-        if data.get("people"):
-            player = data["people"][0]
-            player_data = {
-                "id": player.get("id"),
-                "fullName": player.get("fullName"),
-                "primaryNumber": player.get("primaryNumber"),
-                "birthDate": player.get("birthDate"),
-                "currentAge": player.get("currentAge"),
-                "birthCity": player.get("birthCity"),
-                "birthCountry": player.get("birthCountry"),
-                "height": player.get("height"),
-                "weight": player.get("weight"),
-                "primaryPosition": player.get("primaryPosition", {}).get("name"),
-                "nickName": player.get("nickName", "N/A"),
-                "mlbDebutDate": player.get("mlbDebutDate", "N/A"),
-                "batSide": player.get("batSide", {}).get("description"),
-                "pitchHand": player.get("pitchHand", {}).get("description"),
-                "strikeZoneTop": player.get("strikeZoneTop"),
-                "strikeZoneBottom": player.get("strikeZoneBottom"),
-            }
-            return jsonify(player_data), 200
-        else:
-            return jsonify({"error": "Player data not found"}), 404
+        return json_response(player_data)
 
+    except requests.exceptions.RequestException as e:
+        return player_data_unavailable(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/user/signup", methods=["POST"])
+@api.route('/players', methods=['GET'])
+def get_players_data():
+    """Profiles for a comma-separated list of player ids (?ids=1,2,3)"""
+    try:
+        try:
+            player_ids = [int(player_id) for player_id in request.args.get("ids", "").split(",") if player_id.strip()]
+        except ValueError:
+            return jsonify({"error": "Invalid player ID"}), 400
+
+        if not player_ids:
+            return jsonify({"error": "Missing ids"}), 400
+        if len(player_ids) > MAX_PLAYERS_PER_REQUEST:
+            return jsonify({"error": f"At most {MAX_PLAYERS_PER_REQUEST} ids per request"}), 400
+
+        player_ids = list(dict.fromkeys(player_ids))
+        player_profiles, missing = players.load_players(player_ids)
+
+        return json_response({"players": player_profiles, "missing": missing})
+
+    except requests.exceptions.RequestException as e:
+        return player_data_unavailable(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route("/user/signup", methods=["POST"])
 def signup_user():
     try:
         user_data = request.get_json()
@@ -79,32 +165,26 @@ def signup_user():
             return jsonify({"error": "Missing required fields"}), 400
 
         # Encrypt password
-        hashed_password = generate_password_hash(password).decode('utf-8')
+        hashed_password = password_hasher.hash(password)
 
         # Store user data in database
-        cur = connection.cursor()
-
-        # Insert user data
-        insert_query = """
-            INSERT INTO user_data (username, email, password)
-            VALUES (%s, %s, %s)
-            RETURNING id, username, email;
-        """
+        with db_pool.connection() as connection:
+            cur = connection.cursor()
+
+            # Insert user data
+            insert_query = """
+                INSERT INTO user_data (username, email, password)
+                VALUES (%s, %s, %s)
+                RETURNING id, username, email;
+            """
 
-        cur.execute(insert_query, (username, email, hashed_password))
-        connection.commit()
-        new_user = cur.fetchone()
-        cur.close()
+            cur.execute(insert_query, (username, email, hashed_password), name="signup_insert")
+            connection.commit()
+            new_user = cur.fetchone()
+            cur.close()
 
         # Generate JWT token
-        token = jwt.encode(
-            {
-                "user_id": new_user[0],
-                "exp": datetime.now(timezone.utc) + timedelta(seconds=TOKEN_EXPIRATION_TIME),
-            },
-            SECRET_KEY,
-            algorithm="HS256",
-        )
+        token = auth.issue_token(new_user[0])
 
         return jsonify({
             "message": "User signed up successfully",
@@ -118,15 +198,16 @@ def signup_user():
 
 
     except psycopg2.Error as e:
-        connection.rollback()
         if e.pgcode == '23505':
             return jsonify({"error": "Username or email already exists"}), 409
         return jsonify({"error": "Database error"}), 500
+    except HashPoolFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/user/login", methods=["POST"])
+@api.route("/user/login", methods=["POST"])
 def login_user():
     # Fetch the user email and password, hash the password,
     # compare it with the hashed password from the database
@@ -139,33 +220,30 @@ def login_user():
             return jsonify({"error": "Missing required fields"}), 400
 
         # Query database for user with provided email
-        cur = connection.cursor()
-        select_query = """
-                SELECT id, username, email, password
-                FROM user_data
-                WHERE email = %s;
-            """
-
-        cur.execute(select_query, (email,))
-        user = cur.fetchone()
-        cur.close()
+        with db_pool.connection() as connection:
+            cur = connection.cursor()
+            select_query = """
+                    SELECT id, username, email, password
+                    FROM user_data
+                    WHERE email = %s;
+                """
+
+            cur.execute(select_query, (email,), name="login_select")
+            user = cur.fetchone()
+            cur.close()
 
         if user is None:
             return jsonify({"error": "Invalid email or password"}), 401
 
         # Check if the password provided is correct
-        if not check_password_hash(user[3], password):
+        if not password_hasher.check(user[3], password):
             return jsonify({"error": "Invalid email or password"}), 401
 
+        # Upgrade hashes made with an older bcrypt cost while we have the plain password
+        if password_hasher.needs_rehash(user[3]):
+            rehash_password(user[0], password)
 
-        token = jwt.encode(
-            {
-                "user_id": user[0],
-                "exp": datetime.now(timezone.utc) + timedelta(seconds=TOKEN_EXPIRATION_TIME),
-            },
-            SECRET_KEY,
-            algorithm="HS256",
-        )
+        token = auth.issue_token(user[0])
 
         # If credentials are valid, return success response
         return jsonify({
@@ -178,88 +256,100 @@ def login_user():
             "token": token
         }), 200
 
+    except HashPoolFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/user/players/images", methods=["GET"])
-def get_player_images():
-    # Fetch the headshot image of each player from the database
-    token = request.headers.get("Authorization", "").split("Bearer ")[-1].strip()
-    if not token:
-        return jsonify({"error": "Missing token"}), 401
+def rehash_password(user_id, password):
+    """Store a fresh hash at the current cost; failures only delay the upgrade."""
+    try:
+        new_hashed_password = password_hasher.hash(password)
+        with db_pool.connection() as connection:
+            cur = connection.cursor()
+            cur.execute("""
+                UPDATE user_data
+                SET password = %s
+                WHERE id = %s;
+            """, (new_hashed_password, user_id), name="rehash_update")
+            connection.commit()
+            cur.close()
+    except (HashPoolFull, psycopg2.Error) as e:
+        print(f"Error rehashing password: {e}")
+
+
+def get_player_images_for(player_ids):
+    """Headshot URL for each player id, served through our image cache"""
+    player_images = {}
+    for player_id in player_ids:
+        player_images[player_id] = url_for("api.get_headshot", player_id=player_id, _external=True)
+    return player_images
+
+
+def send_headshot(player_id, size):
+    digest = headshot_cache.get(player_id, size)
+    # The blob hash is a strong ETag, so revalidation is a cheap 304
+    return send_file(headshot_cache.blob_path(digest), mimetype="image/jpeg", etag=digest,
+                     max_age=HEADSHOT_MAX_AGE, conditional=True)
+
+
+@api.route("/images/headshot/<int:player_id>", methods=["GET"])
+def get_headshot(player_id):
+    """Cached player headshot (?size=thumb for the small variant)"""
+    size = request.args.get("size", "full")
+    if size not in VARIANTS:
+        return jsonify({"error": f"size must be one of {', '.join(VARIANTS)}"}), 400
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload["user_id"]
+        try:
+            response = send_headshot(player_id, size)
+        except FileNotFoundError:
+            # Evicted between the lookup and the send; the lookup sees the blob gone and fetches it again
+            response = send_headshot(player_id, size)
+        response.cache_control.public = True
+        return response
+
+    except upstream.UpstreamError as e:
+        if e.status_code == 404:
+            return jsonify({"error": "Headshot not found"}), 404
+        return jsonify({"error": str(e)}), 502
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # Get user's player IDs
-        cur = connection.cursor()
-        select_query = """
-            SELECT unnest(player_id) as player_id
-            FROM user_data 
-            WHERE id = %s
-            ORDER BY added_at DESC;
-        """
-        cur.execute(select_query, (user_id,))
-        player_ids = [row[0] for row in cur.fetchall()]
-        cur.close()
 
-        # Fetch headshot URLs
-        player_images = {}
-        for player_id in player_ids:
-            player_images[player_id] = f'https://securea.mlb.com/mlb/images/players/head_shot/{player_id}.jpg'
+@api.route("/user/players/images", methods=["GET"])
+@auth.login_required
+def get_player_images():
+    # Fetch the headshot image of each player from the database
+    try:
+        player_ids = auth.current_user().player_ids
 
-        return jsonify(player_images), 200
+        return jsonify(get_player_images_for(player_ids)), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({"error": "Token has expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/user/get_username", methods=["GET"])
+@api.route("/user/get_username", methods=["GET"])
+@auth.login_required
 def get_username():
     # Fetch the username of the user associated with the provided JWT token
-    token = request.headers.get("Authorization", "").split("Bearer ")[-1].strip()
-    if not token:
-        return jsonify({"error": "Missing token"}), 401
-
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload["user_id"]
-
-        # Query database to get username
-        cur = connection.cursor()
-        select_query = """
-            SELECT username 
-            FROM user_data 
-            WHERE id = %s;
-        """
-        cur.execute(select_query, (user_id,))
-        username = cur.fetchone()[0]
-        cur.close()
+        return jsonify({"username": auth.current_user().username}), 200
 
-        return jsonify({"username": username}), 200
-
-    except jwt.ExpiredSignatureError:
-        return jsonify({"error": "Token has expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/verify-token", methods=["POST"])
+@api.route("/verify-token", methods=["POST"])
 def verify_token():
     token = request.headers.get("Authorization")
     if not token:
         return jsonify({"error": "Missing token"}), 401
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        payload = auth.decode(token)
         return jsonify({"message": "Token is valid", "user_id": payload["user_id"]}), 200
     except jwt.ExpiredSignatureError:
         return jsonify({"error": "Token has expired"}), 401
@@ -267,76 +357,27 @@ def verify_token():
         return jsonify({"error": "Invalid token"}), 401
 
 
-@app.route("/user/players", methods=["GET"])
+@api.route("/user/players", methods=["GET"])
+@auth.login_required
 def get_user_players():
-    token = request.headers.get("Authorization", "").split("Bearer ")[-1].strip()
-    if not token:
-        return jsonify({"error": "Missing token"}), 401
-
     try:
-        # Verify token and get user_id
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload["user_id"]
+        player_ids = auth.current_user().player_ids
 
-        # Query database for user's selected players
-        cur = connection.cursor()
-        select_query = """
-            SELECT unnest(player_id) as player_id
-            FROM user_data 
-            WHERE id = %s
-            ORDER BY added_at DESC;
-        """
-        cur.execute(select_query, (user_id,))
-        player_ids = [row[0] for row in cur.fetchall()]
-        cur.close()
+        # Cached profiles first; misses are fetched in parallel, keeping the query order
+        player_profiles = players.get_players(player_ids)
 
-        players = []
-        for player_id in player_ids:
-            api_url = f"https://statsapi.mlb.com/api/v1/people/{player_id}/"
-            response = requests.get(api_url)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("people"):
-                    player = data["people"][0]
-                    players.append({
-                        "id": player.get("id"),
-                        "fullName": player.get("fullName"),
-                        "primaryNumber": player.get("primaryNumber"),
-                        "birthDate": player.get("birthDate"),
-                        "currentAge": player.get("currentAge"),
-                        "birthCity": player.get("birthCity"),
-                        "birthCountry": player.get("birthCountry"),
-                        "height": player.get("height"),
-                        "weight": player.get("weight"),
-                        "primaryPosition": player.get("primaryPosition", {}).get("name"),
-                        "nickName": player.get("nickName", "N/A"),
-                        "mlbDebutDate": player.get("mlbDebutDate", "N/A"),
-                        "batSide": player.get("batSide", {}).get("description"),
-                        "pitchHand": player.get("pitchHand", {}).get("description"),
-                        "strikeZoneTop": player.get("strikeZoneTop"),
-                        "strikeZoneBottom": player.get("strikeZoneBottom")
-                    })
-
-        return jsonify(players), 200
+        return json_response(player_profiles)
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({"error": "Token has expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
+    except requests.exceptions.RequestException as e:
+        return player_data_unavailable(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/user/players", methods=["POST"])
+@api.route("/user/players", methods=["POST"])
+@auth.login_required
 def add_player():
-    token = request.headers.get("Authorization", "").split("Bearer ")[-1].strip()
-    if not token:
-        return jsonify({"error": "Missing token"}), 401
-
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload["user_id"]
-
         player_data = request.get_json()
         player_id = player_data.get("player_id")
 
@@ -346,204 +387,261 @@ def add_player():
         except (ValueError, TypeError):
             return jsonify({"error": "Invalid player ID"}), 400
 
-        # Check if player already exists for user
-        cur = connection.cursor()
-        check_query = """
-            SELECT EXISTS(
-                SELECT 1 
-                FROM user_data 
-                WHERE id = %s AND %s = ANY(player_id)
-            );
-        """
-        cur.execute(check_query, (user_id, player_id))
-        exists = cur.fetchone()[0]
-
-        if exists:
+        # Add player to user's list; the primary key turns a repeat follow into a no-op
+        with db_pool.connection() as connection:
+            cur = connection.cursor()
+            insert_query = """
+                INSERT INTO user_players (user_id, player_id)
+                VALUES (%s, %s)
+                ON CONFLICT DO NOTHING;
+            """
+            cur.execute(insert_query, (g.user_id, player_id), name="add_player")
+            added = cur.rowcount == 1
+            if added:
+                user_changes.notify(cur, g.user_id, user_changes.FOLLOWS)
+            connection.commit()
             cur.close()
-            return jsonify({"error": "Player already added"}), 409
+        auth.invalidate_user(g.user_id)
 
-        # Add player to user's list
-        insert_query = """
-            UPDATE user_data 
-            SET player_id = array_append(COALESCE(player_id, ARRAY[]::INTEGER[]), %s),
-                added_at = NOW()
-            WHERE id = %s;
-        """
-        cur.execute(insert_query, (player_id, user_id))
-        connection.commit()
-        cur.close()
+        if not added:
+            return jsonify({"error": "Player already added"}), 409
 
         return jsonify({"message": "Player added successfully"}), 201
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({"error": "Token has expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
     except Exception as e:
-        connection.rollback()
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/user/players/<int:player_id>", methods=["DELETE"])
+@api.route("/user/players/<int:player_id>", methods=["DELETE"])
+@auth.login_required
 def remove_player(player_id):
-    token = request.headers.get("Authorization", "").split("Bearer ")[-1].strip()
-    if not token:
-        return jsonify({"error": "Missing token"}), 401
-
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload["user_id"]
-
         # Remove player from user's list
-        cur = connection.cursor()
-        delete_query = """
-            UPDATE user_data 
-            SET player_id = array_remove(player_id, %s)
-            WHERE id = %s;
-        """
-        cur.execute(delete_query, (player_id, user_id))
-        connection.commit()
-        cur.close()
+        with db_pool.connection() as connection:
+            cur = connection.cursor()
+            delete_query = """
+                DELETE FROM user_players
+                WHERE user_id = %s AND player_id = %s;
+            """
+            cur.execute(delete_query, (g.user_id, player_id), name="remove_player")
+            if cur.rowcount:
+                user_changes.notify(cur, g.user_id, user_changes.FOLLOWS)
+            connection.commit()
+            cur.close()
+        auth.invalidate_user(g.user_id)
 
         return jsonify({"message": "Player removed successfully"}), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({"error": "Token has expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
     except Exception as e:
-        connection.rollback()
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/user/change_password", methods=["POST"])
-def change_password():
-    token = request.headers.get("Authorization", "").split("Bearer ")[-1].strip()
-    if not token:
-        return jsonify({"error": "Missing token"}), 401
+def bulk_player_ids():
+    """Distinct player ids from a {"player_ids": [...]} body, in order, or an error response."""
+    data = request.get_json(silent=True) or {}
+    raw_ids = data.get("player_ids")
+    if not isinstance(raw_ids, list) or not raw_ids:
+        return None, (jsonify({"error": "player_ids must be a non-empty list"}), 400)
+    try:
+        player_ids = list(dict.fromkeys(int(player_id) for player_id in raw_ids))
+    except (ValueError, TypeError):
+        return None, (jsonify({"error": "Invalid player ID"}), 400)
+    if len(player_ids) > MAX_PLAYERS_PER_REQUEST:
+        return None, (jsonify({"error": f"At most {MAX_PLAYERS_PER_REQUEST} ids per request"}), 400)
+    return player_ids, None
+
+
+@api.route("/user/players/bulk", methods=["POST"])
+@auth.login_required
+def add_players_bulk():
+    """Follow several players at once; each id comes back as added, already-following or unknown"""
+    try:
+        player_ids, error = bulk_player_ids()
+        if error:
+            return error
+
+        # Cached profiles and the local store first; only ids neither knows reach statsapi, in batches
+        _, missing = players.load_players(player_ids)
+        unknown = set(missing)
+        valid_ids = [player_id for player_id in player_ids if player_id not in unknown]
+
+        added = set()
+        if valid_ids:
+            with db_pool.connection() as connection:
+                cur = connection.cursor()
+                # One statement for the whole list; later ids get later timestamps so the order is kept
+                insert_query = """
+                    INSERT INTO user_players (user_id, player_id, added_at)
+                    SELECT %s, requested.player_id, NOW() + requested.ord * INTERVAL '1 microsecond'
+                    FROM unnest(%s::INTEGER[]) WITH ORDINALITY AS requested (player_id, ord)
+                    ON CONFLICT DO NOTHING
+                    RETURNING player_id;
+                """
+                cur.execute(insert_query, (g.user_id, valid_ids), name="add_players_bulk")
+                added = {row[0] for row in cur.fetchall()}
+                if added:
+                    user_changes.notify(cur, g.user_id, user_changes.FOLLOWS)
+                connection.commit()
+                cur.close()
+            auth.invalidate_user(g.user_id)
+
+        results = []
+        for player_id in player_ids:
+            if player_id in unknown:
+                status = "unknown"
+            elif player_id in added:
+                status = "added"
+            else:
+                status = "already-following"
+            results.append({"player_id": player_id, "status": status})
+
+        return jsonify({"results": results}), 200
+
+    except requests.exceptions.RequestException as e:
+        return player_data_unavailable(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 
+@api.route("/user/players/bulk", methods=["DELETE"])
+@auth.login_required
+def remove_players_bulk():
+    """Unfollow several players at once; ids the user was not following come back as unknown"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload["user_id"]
+        player_ids, error = bulk_player_ids()
+        if error:
+            return error
+
+        with db_pool.connection() as connection:
+            cur = connection.cursor()
+            delete_query = """
+                DELETE FROM user_players
+                WHERE user_id = %s AND player_id = ANY(%s::INTEGER[])
+                RETURNING player_id;
+            """
+            cur.execute(delete_query, (g.user_id, player_ids), name="remove_players_bulk")
+            removed = {row[0] for row in cur.fetchall()}
+            if removed:
+                user_changes.notify(cur, g.user_id, user_changes.FOLLOWS)
+            connection.commit()
+            cur.close()
+        auth.invalidate_user(g.user_id)
+
+        results = [{"player_id": player_id, "status": "removed" if player_id in removed else "unknown"}
+                   for player_id in player_ids]
+
+        return jsonify({"results": results}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 
+@api.route("/user/change_password", methods=["POST"])
+@auth.login_required
+def change_password():
+    try:
         # Retrieve old & new password
         password_data = request.get_json()
         current_password = password_data.get("current_password")
         new_password = password_data.get("new_password")
 
         # Verify current password
-        cur = connection.cursor()
-        select_query = """
-            SELECT password 
-            FROM user_data 
-            WHERE id = %s;
-        """
-        cur.execute(select_query, (user_id,))
-        stored_password = cur.fetchone()[0]
-
-        if not check_password_hash(stored_password, current_password):
+        with db_pool.connection() as connection:
+            cur = connection.cursor()
+            select_query = """
+                SELECT password 
+                FROM user_data 
+                WHERE id = %s;
+            """
+            cur.execute(select_query, (g.user_id,), name="change_password_select")
+            stored_password = cur.fetchone()[0]
             cur.close()
+
+        # Hash outside the connection block so a DB connection is not held during bcrypt
+        if not password_hasher.check(stored_password, current_password):
             return jsonify({"error": "Incorrect current password"}), 401
+        new_hashed_password = password_hasher.hash(new_password)
 
         # Update password
-        update_query = """
-            UPDATE user_data 
-            SET password = %s
-            WHERE id = %s;
-        """
-        new_hashed_password = generate_password_hash(new_password).decode('utf-8')
-        cur.execute(update_query, (new_hashed_password, user_id))
-        connection.commit()
-        cur.close()
+        with db_pool.connection() as connection:
+            cur = connection.cursor()
+            update_query = """
+                UPDATE user_data 
+                SET password = %s
+                WHERE id = %s;
+            """
+            cur.execute(update_query, (new_hashed_password, g.user_id), name="change_password_update")
+            connection.commit()
+            cur.close()
 
         return jsonify({"message": "Password changed successfully"}), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({"error": "Token has expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
+    except HashPoolFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
-        connection.rollback()
         return jsonify({"error": str(e)}), 500
 
 
 def get_team_for_player(player_id):
-    """Finds the team a player plays for (using roster search)."""
-    teams_endpoint_url = 'https://statsapi.mlb.com/api/v1/teams?sportId=1'
-    try:
-        teams_response = requests.get(teams_endpoint_url)
-        teams_response.raise_for_status()
-        teams_data = teams_response.json()
-        teams = teams_data.get("teams", [])
-
-        for team in teams:
-            team_id = team["id"]
-            roster_url = f'https://statsapi.mlb.com/api/v1/teams/{team_id}/roster?season={datetime.now().year}'
-            roster_response = requests.get(roster_url)
-            roster_response.raise_for_status()
-            roster_data = roster_response.json()
-            roster = roster_data.get("roster", [])
-
-            for player_entry in roster:
-                roster_player_id = player_entry.get("person", {}).get("id")
-                if roster_player_id == player_id:
-                    return team["name"], team_id
-
-        return None, None  # Player not found
+    """Finds the team a player plays for (using the season roster index)."""
+    return roster_index.lookup(player_id)
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching team/roster: {e}")
-        return None, None
+
+def get_player_teams_for(player_ids):
+    """Team name and id for each player id, from the roster index"""
+    player_teams = {}
+    for player_id in player_ids:
+        team_name, team_id = get_team_for_player(player_id)
+        if team_name:
+            player_teams[player_id] = {"teamName": team_name, "teamId": team_id}
+        else:
+            player_teams[player_id] = {"teamName": "Team not found"}
+    return player_teams
 
 
-@app.route("/user/players/teams", methods=["GET"])
+@api.route("/user/players/teams", methods=["GET"])
+@auth.login_required
 def get_user_player_teams():
     """Get the teams based on player id from the database"""
-    token = request.headers.get("Authorization", "").split("Bearer ")[-1].strip()
-    if not token:
-        return jsonify({"error": "Missing token"}), 401
-
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload["user_id"]
+        player_ids = auth.current_user().player_ids
 
-        cur = connection.cursor()
-        select_query = """
-            SELECT unnest(player_id) as player_id
-            FROM user_data 
-            WHERE id = %s
-            ORDER BY added_at DESC;
-        """
-        cur.execute(select_query, (user_id,))
-        player_ids = [row[0] for row in cur.fetchall()]
-        cur.close()
+        return jsonify(get_player_teams_for(player_ids)), 200
 
-        player_teams = {}
-        for player_id in player_ids:
-            team_name, team_id = get_team_for_player(player_id)  #
-            if team_name:
-                player_teams[player_id] = {"teamName": team_name, "teamId": team_id}
-            else:
-                player_teams[player_id] = {"teamName": "Team not found"}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        return jsonify(player_teams), 200
 
-    except jwt.ExpiredSignatureError:
-        return jsonify({"error": "Token has expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
+@api.route("/user/players/stats", methods=["GET"])
+@auth.login_required
+def get_user_player_stats():
+    """Season, last-N-game and home/away lines for each followed player (?season=2024&windows=7,15)"""
+    try:
+        try:
+            season = int(request.args.get("season", datetime.now().year))
+            windows = tuple(int(window) for window in request.args.get("windows", "").split(",") if window.strip())
+        except ValueError:
+            return jsonify({"error": "Invalid season or windows"}), 400
+        if not valid_season(season):
+            return jsonify({"error": "Invalid season"}), 400
+        windows = windows or STATS_DEFAULT_WINDOWS
+        if len(windows) > STATS_MAX_WINDOWS or not all(1 <= window <= 162 for window in windows):
+            return jsonify({"error": f"Up to {STATS_MAX_WINDOWS} windows, each between 1 and 162 games"}), 400
+
+        player_ids = auth.current_user().player_ids
+        entries = game_log_store.get_many(player_ids, season)
+
+        return jsonify({"season": season, "players": aggregate(entries, windows)}), 200
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/user/preference', methods=['POST'])
+@api.route('/user/preference', methods=['POST'])
+@auth.login_required
 def update_preferences():
     """Store preference (season, game_pk) to database"""
-    token = request.headers.get("Authorization", "").split("Bearer ")[-1].strip()
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload["user_id"]
-
         data = request.get_json()
 
         if not data or not data.get('game_pk'):
@@ -551,62 +649,264 @@ def update_preferences():
 
         game_pk = data['game_pk']
 
-        cur = connection.cursor()
-        cur.execute("""
-            UPDATE user_data 
-            SET game_pk = %s
-            WHERE id = %s;
-        """, (game_pk, user_id))
-        connection.commit()
-
-        connection.rollback()
-
-        cur.close()
+        with db_pool.connection() as connection:
+            cur = connection.cursor()
+            cur.execute("""
+                UPDATE user_data 
+                SET game_pk = %s
+                WHERE id = %s;
+            """, (game_pk, g.user_id), name="preference_update")
+            user_changes.notify(cur, g.user_id, user_changes.PREFERENCE)
+            connection.commit()
+            cur.close()
+        auth.invalidate_user(g.user_id)
 
         return jsonify({"message": "Preferences updated successfully"}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    except jwt.ExpiredSignatureError:
-        return jsonify({"error": "Token has expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
 
 
-@app.route('/user/preference', methods=['GET'])
+@api.route('/user/preference', methods=['GET'])
+@auth.login_required
 def obtain_preferences():
     """Fetch the preferences"""
-    token = request.headers.get("Authorization", "").split("Bearer ")[-1].strip()
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload["user_id"]
+        return jsonify({"game_pk": auth.current_user().game_pk})
 
-        cur = connection.cursor()
-        cur.execute("""
-            SELECT game_pk
-            FROM user_data
-            WHERE id = %s;
-        """, (user_id,))
-        result = cur.fetchone()
-        cur.close()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        if result:
-            game_pk = result
-            return jsonify({"game_pk": game_pk})
-        else:
-            return jsonify({"game_pk": None})
+
+@api.route("/games/<int:game_pk>/stream", methods=["GET"])
+def stream_game(game_pk):
+    """Server-Sent Events for a game's live feed: a snapshot, then patches as plays happen"""
+    subscription = live_game_hub.subscribe(game_pk)
+
+    def events():
+        try:
+            while True:
+                try:
+                    event = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield event
+                if event.startswith(("event: final", "event: notFound")):
+                    return
+        finally:
+            # Runs when the client disconnects; the last one out stops the poller
+            live_game_hub.unsubscribe(subscription)
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+@api.route("/user/games/<int:game_pk>/highlights", methods=["GET"])
+@auth.login_required
+def get_user_game_highlights(game_pk):
+    """Batting and pitching lines and key plays for the followed players in one game"""
+    try:
+        game = highlights_engine.get(game_pk)
+        if not game.wait_ready(HIGHLIGHTS_WAIT_SECONDS):
+            return jsonify({"error": "Game feed not available yet"}), 503, {"Retry-After": "2"}
+        if game.not_found:
+            return jsonify({"error": "Game not found"}), 404
+
+        return jsonify(game.report(auth.current_user().player_ids)), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    except jwt.ExpiredSignatureError:
-        return jsonify({"error": "Token has expired"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
 
 
-@app.route("/")
+@api.route("/user/dashboard", methods=["GET"])
+@auth.login_required
+def get_user_dashboard():
+    """Players, teams, headshots and preference in one response (?fields=players,teams to pick)"""
+    try:
+        fields = {field.strip() for field in request.args.get("fields", "").split(",") if field.strip()}
+        fields = fields or DASHBOARD_FIELDS
+        unknown = fields - DASHBOARD_FIELDS
+        if unknown:
+            return jsonify({"error": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+
+        user = auth.current_user()
+        dashboard = {}
+        if "players" in fields:
+            dashboard["players"] = players.get_players(user.player_ids)
+        if "teams" in fields:
+            dashboard["teams"] = get_player_teams_for(user.player_ids)
+        if "images" in fields:
+            dashboard["images"] = get_player_images_for(user.player_ids)
+        if "preference" in fields:
+            dashboard["preference"] = {"game_pk": user.game_pk}
+
+        return json_response(dashboard)
+
+    except requests.exceptions.RequestException as e:
+        return player_data_unavailable(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def schedule_page(team_ids=None):
+    """Query the season schedule from request args (season, start, end, page, pageSize)"""
+    try:
+        season = int(request.args.get("season", datetime.now().year))
+        page = int(request.args.get("page", 1))
+        page_size = int(request.args.get("pageSize", SCHEDULE_DEFAULT_PAGE_SIZE))
+        # Zero-padded, since the schedule is searched by comparing date strings
+        start, end = (datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d") if date else None
+                      for date in (request.args.get("start"), request.args.get("end")))
+    except ValueError:
+        return jsonify({"error": "Invalid season, date or paging parameter"}), 400
+
+    if not valid_season(season):
+        return jsonify({"error": "Invalid season"}), 400
+
+    if page < 1 or not 1 <= page_size <= SCHEDULE_MAX_PAGE_SIZE:
+        return jsonify({"error": f"page must be >= 1 and pageSize between 1 and {SCHEDULE_MAX_PAGE_SIZE}"}), 400
+
+    season_schedule = schedule_store.get(season)
+    positions = season_schedule.query(start, end, team_ids)
+    offset = (page - 1) * page_size
+
+    return jsonify({
+        "season": season,
+        "total": len(positions),
+        "page": page,
+        "pageSize": page_size,
+        "games": [game_to_json(season_schedule.games[position]) for position in positions[offset:offset + page_size]],
+    }), 200
+
+
+@api.route("/schedule", methods=["GET"])
+def get_schedule():
+    """Games for a season, filtered by date range and team ids (?teamId=147,121)"""
+    try:
+        try:
+            team_ids = [int(team_id) for team_id in request.args.get("teamId", "").split(",") if team_id.strip()]
+        except ValueError:
+            return jsonify({"error": "Invalid team ID"}), 400
+
+        return schedule_page(team_ids)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route("/user/schedule", methods=["GET"])
+@auth.login_required
+def get_user_schedule():
+    """Games involving the teams of the players the user follows"""
+    try:
+        season = request.args.get("season", type=int)
+        if season is not None and not valid_season(season):
+            return jsonify({"error": "Invalid season"}), 400
+        team_ids = set()
+        for player_id in auth.current_user().player_ids:
+            team_id = roster_index.lookup(player_id, season)[1]
+            if team_id is not None:
+                team_ids.add(team_id)
+
+        if not team_ids:
+            return jsonify({"season": season or datetime.now().year, "total": 0, "page": 1,
+                            "pageSize": 0, "games": []}), 200
+
+        return schedule_page(sorted(team_ids))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route("/stats", methods=["GET"])
+def get_stats():
+    """Counters for the in-process caches, the DB pool and password hashing"""
+    return jsonify({
+        "playerCache": players.profile_cache.stats(),
+        "userCache": auth.users.stats(),
+        "userChanges": user_change_listener.stats(),
+        "dbPool": db_pool.stats(),
+        "passwordHashing": password_hasher.stats(),
+        "liveGames": live_game_hub.active_games(),
+        "highlights": highlights_engine.stats(),
+        "gameLogs": game_log_store.stats(),
+        "upstream": upstream.stats(),
+        "headshotCache": headshot_cache.stats(),
+        "profiler": slow_request_profiler.stats(),
+    }), 200
+
+
+@api.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Request, DB, upstream and cache metrics in the Prometheus text format"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@api.route("/")
 def home():
     return jsonify({"message": "Welcome to the MLB Server API"})
 
+
+def most_followed_player_ids(limit):
+    """The players with the most followers, busiest first"""
+    with db_pool.connection() as connection:
+        cur = connection.cursor()
+        # Grouped straight off the player_id index
+        cur.execute("""
+            SELECT player_id
+            FROM user_players
+            GROUP BY player_id
+            ORDER BY COUNT(*) DESC
+            LIMIT %s;
+        """, (limit,), name="most_followed")
+        player_ids = [row[0] for row in cur.fetchall()]
+        cur.close()
+    return player_ids
+
+
+# Start-up warm-up: the current season's teams and rosters, then the most-followed players' profiles
+warm_up = WarmUp([
+    ("rosters", lambda: roster_index.ensure(datetime.now().year)),
+    ("players", lambda: players.get_players(most_followed_player_ids(WARM_UP_PLAYERS))),
+])
+
+
+@api.route("/ready", methods=["GET"])
+def get_ready():
+    """Readiness probe: 503 until the warm-up has finished"""
+    return jsonify(warm_up.stats()), 200 if warm_up.ready else 503
+
+
+def create_app(warm=WARM_UP):
+    """Build the Flask app and start the background work.
+
+    Nothing here waits on the database or statsapi: connections are made
+    on first use, and the warm-up runs on its own thread while /ready
+    reports 503.
+    """
+    app = Flask(__name__)
+
+    # Per-route latency and status metrics, plus slow request profiles when enabled
+    metrics.instrument(app, slow_request_profiler if slow_request_profiler.enabled else None)
+
+    # (CORS) configuration
+    CORS(app, supports_credentials=True)
+
+    app.register_blueprint(api)
+
+    roster_index.start()
+    user_change_listener.start()
+    highlights_engine.start()
+    if warm:
+        warm_up.start()
+    else:
+        warm_up.skip()
+    return app
+
+
 if __name__ == "__main__":
-    app.run(host='localhost', port=5000, debug=True)
\ No newline at end of file
+    # The reloader would run create_app() in its watcher process too, starting every background thread twice
+    create_app().run(host='localhost', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,308 @@
+import argparse
+import bisect
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import requests
+
+# off: no store; record: append every upstream body and fall back to it when statsapi fails;
+# replay: serve every upstream call from the store and never touch the network
+SNAPSHOT_MODE = os.getenv("SNAPSHOT_MODE", "off").lower()
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "snapshots"))
+# Recording stops once the log reaches this size
+SNAPSHOT_MAX_BYTES = int(os.getenv("SNAPSHOT_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+# Unindexed records allowed to pile up before the sorted index is rewritten
+SNAPSHOT_REINDEX_EVERY = int(os.getenv("SNAPSHOT_REINDEX_EVERY", 5000))
+# Replay the store as of this moment (ISO 8601), with time moving on from there; unset replays the latest bodies
+SNAPSHOT_REPLAY_AT = os.getenv("SNAPSHOT_REPLAY_AT")
+
+LOG_NAME = "snapshots.log"
+INDEX_NAME = "snapshots.idx"
+
+# Log record: magic, URL length, compressed body length, fetch time; then the URL and the zlib body
+RECORD_HEADER = struct.Struct("<4sIId")
+RECORD_MAGIC = b"SNP1"
+# Index file: magic, entry count, log offset covered; then entries sorted by (URL hash, fetch time)
+INDEX_HEADER = struct.Struct("<8sQQ")
+INDEX_MAGIC = b"SNPIDX1\0"
+INDEX_ENTRY = struct.Struct("<QdQ")
+
+
+class SnapshotMissing(requests.exceptions.ConnectionError):
+    """Replay mode was asked for a URL the store has no body for."""
+
+
+def url_key(url):
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class _IndexEntries:
+    """Sequence view of the mapped index file's ``(url key, fetched_at)`` pairs, for bisect."""
+
+    def __init__(self, buffer, count):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return INDEX_ENTRY.unpack_from(self.buffer, INDEX_HEADER.size + i * INDEX_ENTRY.size)[:2]
+
+    def offset(self, i):
+        return INDEX_ENTRY.unpack_from(self.buffer, INDEX_HEADER.size + i * INDEX_ENTRY.size)[2]
+
+
+class SnapshotStore:
+    """Append-only, zlib-compressed log of upstream bodies, keyed by URL and fetch time.
+
+    Records are appended to ``snapshots.log``. ``snapshots.idx`` holds a
+    sorted fixed-width table of ``(url key, fetched_at, log offset)`` for
+    the log up to some offset. It is memory-mapped and binary-searched,
+    so opening the store costs nothing however big it gets. Records past
+    that offset are kept in a small in-memory tail until the next
+    reindex folds them in.
+
+    Several worker processes may record into the same directory:
+    appends and reindexes take a file lock, and each process picks up
+    the others' records from the end of the log when it looks something
+    up. A body identical to the last one recorded for its URL is
+    skipped, so a slow-moving endpoint polled all day costs one record.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR, max_bytes=SNAPSHOT_MAX_BYTES, reindex_every=SNAPSHOT_REINDEX_EVERY):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.reindex_every = reindex_every
+        self.log_path = os.path.join(root, LOG_NAME)
+        self.index_path = os.path.join(root, INDEX_NAME)
+        self._lock = threading.Lock()
+        self._log_fd = None
+        self._index_file = None
+        self._index_map = None
+        self._index = _IndexEntries(b"", 0)
+        self._index_inode = None
+        self._indexed_until = 0
+        self._tail = {}
+        self._tail_count = 0
+        self._scanned_until = 0
+        self._last_digest = {}
+        self._reindexing = False
+        self.recorded = 0
+        self.unchanged = 0
+        self.dropped = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _open(self):
+        if self._log_fd is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._log_fd = os.open(self.log_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+            self._load_index()
+
+    def _load_index(self):
+        """Map the index file if it was (re)written since we last looked, and rescan the log from where it stops."""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino == self._index_inode or stat.st_size < INDEX_HEADER.size:
+            return
+        try:
+            index_file = open(self.index_path, "rb")
+        except FileNotFoundError:
+            return
+        stat = os.fstat(index_file.fileno())
+        index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, indexed_until = INDEX_HEADER.unpack_from(index_map, 0)
+        if magic != INDEX_MAGIC:
+            index_map.close()
+            index_file.close()
+            return
+
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_file.close()
+        self._index_file, self._index_map, self._index_inode = index_file, index_map, stat.st_ino
+        self._index = _IndexEntries(index_map, count)
+        self._indexed_until = indexed_until
+        self._tail = {}
+        self._tail_count = 0
+        self._scanned_until = indexed_until
+
+    def _scan_tail(self):
+        """Add records appended since the last look (by any process) to the in-memory tail."""
+        size = os.fstat(self._log_fd).st_size
+        offset = self._scanned_until
+        while offset + RECORD_HEADER.size <= size:
+            magic, url_length, body_length, fetched_at = RECORD_HEADER.unpack(
+                os.pread(self._log_fd, RECORD_HEADER.size, offset))
+            end = offset + RECORD_HEADER.size + url_length + body_length
+            if magic != RECORD_MAGIC or end > size:
+                # A record still being written by another process; pick it up next time
+                break
+            url = os.pread(self._log_fd, url_length, offset + RECORD_HEADER.size).decode("utf-8")
+            self._tail.setdefault(url_key(url), []).append((fetched_at, offset))
+            self._tail_count += 1
+            offset = end
+        self._scanned_until = offset
+
+    def _read(self, offset, url):
+        magic, url_length, body_length, _ = RECORD_HEADER.unpack(os.pread(self._log_fd, RECORD_HEADER.size, offset))
+        data = os.pread(self._log_fd, url_length + body_length, offset + RECORD_HEADER.size)
+        # Keys are 64-bit hashes; make sure this record really is for the URL asked about
+        if magic != RECORD_MAGIC or data[:url_length].decode("utf-8") != url:
+            return None
+        return zlib.decompress(data[url_length:])
+
+    def _find(self, key, at):
+        """Log offset of the newest record for a key fetched at or before ``at``."""
+        at = float("inf") if at is None else at
+        for fetched_at, offset in reversed(self._tail.get(key, ())):
+            if fetched_at <= at:
+                return offset
+        i = bisect.bisect_right(self._index, (key, at)) - 1
+        if i >= 0 and self._index[i][0] == key:
+            return self._index.offset(i)
+        return None
+
+    def _refresh(self):
+        self._open()
+        self._load_index()
+        self._scan_tail()
+
+    def refresh(self):
+        """Pick up records and index rewrites made by other processes."""
+        with self._lock:
+            self._refresh()
+
+    def lookup(self, url, at=None):
+        """The newest stored body for a URL, as of ``at`` (epoch seconds) if given, or None."""
+        key = url_key(url)
+        with self._lock:
+            self._refresh()
+            offset = self._find(key, at)
+            body = self._read(offset, url) if offset is not None else None
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return body
+
+    def record(self, url, body):
+        """Append a body fetched just now, unless it matches the last one stored for the URL."""
+        key = url_key(url)
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        with self._lock:
+            if self._last_digest.get(key) == digest:
+                self.unchanged += 1
+                return
+            self._open()
+            encoded_url = url.encode("utf-8")
+            compressed = zlib.compress(body, 6)
+            record = RECORD_HEADER.pack(RECORD_MAGIC, len(encoded_url), len(compressed), time.time()) \
+                + encoded_url + compressed
+
+            fcntl.flock(self._log_fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._log_fd).st_size + len(record) > self.max_bytes:
+                    self.dropped += 1
+                    return
+                # One write with O_APPEND, so records from several processes never interleave
+                os.write(self._log_fd, record)
+            finally:
+                fcntl.flock(self._log_fd, fcntl.LOCK_UN)
+            self._last_digest[key] = digest
+            self.recorded += 1
+            self._scan_tail()
+            reindex = self._tail_count >= self.reindex_every and not self._reindexing
+            if reindex:
+                self._reindexing = True
+        if reindex:
+            threading.Thread(target=self._background_reindex, name="snapshot-reindex", daemon=True).start()
+
+    def _background_reindex(self):
+        try:
+            self.reindex()
+        except OSError as e:
+            print(f"Error reindexing snapshots: {e}")
+        finally:
+            with self._lock:
+                self._reindexing = False
+
+    def reindex(self):
+        """Rewrite the sorted index to cover the whole log, then map the new one."""
+        with self._lock:
+            self._open()
+        lock_fd = os.open(self.index_path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # One process rewrites at a time; the others just map its result
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            with self._lock:
+                self._refresh()
+                entries = [(self._index[i][0], self._index[i][1], self._index.offset(i))
+                           for i in range(len(self._index))]
+                entries.extend((key, fetched_at, offset) for key, records in self._tail.items()
+                               for fetched_at, offset in records)
+                indexed_until = self._scanned_until
+            entries.sort()
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.root)
+            with os.fdopen(fd, "wb") as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(entries), indexed_until))
+                for entry in entries:
+                    f.write(INDEX_ENTRY.pack(*entry))
+            os.replace(tmp_path, self.index_path)
+
+            with self._lock:
+                self._refresh()
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            os.close(lock_fd)
+        return len(entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "indexed": len(self._index),
+                "unindexed": self._tail_count,
+                "bytes": self._scanned_until,
+                "recorded": self.recorded,
+                "unchanged": self.unchanged,
+                "dropped": self.dropped,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def replay_at():
+    """SNAPSHOT_REPLAY_AT as epoch seconds, or None for the latest bodies."""
+    if not SNAPSHOT_REPLAY_AT:
+        return None
+    return datetime.fromisoformat(SNAPSHOT_REPLAY_AT).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the upstream snapshot store.")
+    parser.add_argument("command", choices=["reindex", "stats"])
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help=f"store directory (default: {SNAPSHOT_DIR})")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.dir)
+    if args.command == "reindex":
+        print(f"Indexed {store.reindex()} records")
+    else:
+        store.refresh()
+        print(store.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Load .env before the local modules read their settings
+load_dotenv()
+
+from db import ConnectionPool
+from player_store import PlayerStore
+
+# Past seasons synced alongside the current one by default
+PLAYER_SYNC_PAST_SEASONS = int(os.getenv("PLAYER_SYNC_PAST_SEASONS", 1))
+
+
+def main():
+    current = datetime.now().year
+    parser = argparse.ArgumentParser(description="Bulk-load MLB player profiles into the local players table.")
+    parser.add_argument("--seasons", type=int, nargs="+",
+                        default=list(range(current - PLAYER_SYNC_PAST_SEASONS, current + 1)),
+                        help="seasons to sync (default: the current season and the previous one)")
+    args = parser.parse_args()
+
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        sys.exit("DATABASE_URL is not set")
+
+    db_pool = ConnectionPool(url, minconn=1, maxconn=1)
+    try:
+        results = PlayerStore(db_pool).sync(args.seasons)
+    finally:
+        db_pool.close()
+
+    for season, (seen, changed) in sorted(results.items()):
+        print(f"{season}: {seen} players, {changed} rows changed")
+    if len(results) < len(args.seasons):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
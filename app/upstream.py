@@ -0,0 +1,406 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import snapshots
+from resilience import CircuitBreaker, RetryBudget, backoff_delay
+from snapshots import SnapshotMissing, SnapshotStore
+
+# Base URL of the MLB Stats API; the benchmarks point it at a local stand-in
+STATSAPI_URL = os.getenv("STATSAPI_URL", "https://statsapi.mlb.com").rstrip("/")
+# Upper bound on simultaneous statsapi requests from this process
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", 8))
+# Connect and read timeouts in seconds
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", 3.05))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", 10))
+UPSTREAM_TIMEOUT = (UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_READ_TIMEOUT)
+# Retries per call, on top of the first attempt, while the retry budget allows
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 2))
+# Consecutive failures that open a host's breaker, and how long it stays open (seconds)
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30))
+# Last good bodies kept per URL to serve while statsapi is failing
+UPSTREAM_FALLBACK_SIZE = int(os.getenv("UPSTREAM_FALLBACK_SIZE", 2000))
+# ... and the most response bytes they may add up to; parsed bodies take several times this in memory
+UPSTREAM_FALLBACK_MAX_BYTES = int(os.getenv("UPSTREAM_FALLBACK_MAX_BYTES", 32 * 1024 * 1024))
+
+# Batch endpoints recorded one snapshot per id, since a replay's batches are whatever ids missed its caches:
+# path -> (id list query parameter, list key in the body)
+SNAPSHOT_BATCHES = {"/api/v1/people": ("personIds", "people")}
+# Query parameters a replay may drop to find a body when the exact URL was never recorded; without
+# startDate a game log holds every game of the season as of recording, a superset of any top-up
+SNAPSHOT_OPTIONAL_PARAMS = ("startDate",)
+
+# Statuses worth retrying; other non-200 answers are final
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Keep-alive connection pool shared by every upstream call, created on first use
+_session = None
+_session_lock = threading.Lock()
+
+_executor = ThreadPoolExecutor(max_workers=UPSTREAM_MAX_CONCURRENCY, thread_name_prefix="upstream")
+
+
+class UpstreamError(requests.exceptions.HTTPError):
+    """statsapi answered with a non-200 status."""
+
+    def __init__(self, url, status_code):
+        super().__init__(f"{url} returned HTTP {status_code}")
+        self.url = url
+        self.status_code = status_code
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """The host's circuit breaker is open, so the call was not attempted."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one execution.
+
+    The first caller (the leader) runs the function; everyone who asks
+    for the same key while it is running waits and gets the same result
+    or the same exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.collapsed = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "inFlight": len(self._calls),
+                "executed": self.executed,
+                "collapsed": self.collapsed,
+            }
+
+
+single_flight = SingleFlight()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_MAX_CONCURRENCY)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get(url, timeout=UPSTREAM_TIMEOUT):
+    """GET a URL through the pooled session."""
+    return get_session().get(url, timeout=timeout)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+retry_budget = RetryBudget()
+
+# url -> (parsed body, response size in bytes)
+_fallback = OrderedDict()
+_fallback_bytes = 0
+_fallback_lock = threading.Lock()
+
+_counters_lock = threading.Lock()
+_counters = {"timeouts": 0, "retries": 0, "fallbackServed": 0, "snapshotServed": 0}
+
+# On-disk record of upstream bodies: last-known-good fallback when recording, the only source when replaying
+snapshot_store = SnapshotStore() if snapshots.SNAPSHOT_MODE in ("record", "replay") else None
+replaying = snapshots.SNAPSHOT_MODE == "replay"
+# With SNAPSHOT_REPLAY_AT the replay clock starts there and runs in real time, so live feeds move on
+_replay_at = snapshots.replay_at() if replaying else None
+_replay_started = time.time()
+
+
+def _replay_clock():
+    return None if _replay_at is None else _replay_at + (time.time() - _replay_started)
+
+
+def _snapshot_key(url):
+    """statsapi bodies are stored by path and query, so a recording replays against any STATSAPI_URL."""
+    return url[len(STATSAPI_URL):] if url.startswith(STATSAPI_URL + "/") else url
+
+
+def _snapshot_batch(key):
+    """``(path, parameter, list key, ids)`` if the key is a batch recorded per id, else None."""
+    parts = urlsplit(key)
+    batch = SNAPSHOT_BATCHES.get(parts.path)
+    if batch is None:
+        return None
+    parameter, list_key = batch
+    query = parts.query.split("&")
+    if len(query) != 1 or not query[0].startswith(parameter + "="):
+        return None
+    return parts.path, parameter, list_key, query[0][len(parameter) + 1:].split(",")
+
+
+def _record_snapshot(key, content):
+    batch = _snapshot_batch(key)
+    if batch is not None:
+        path, parameter, list_key, ids = batch
+        try:
+            body = json.loads(content)
+            items = {str(item.get("id")): item for item in body.get(list_key, [])}
+        except (ValueError, AttributeError):
+            batch = None
+    if batch is None:
+        snapshot_store.record(key, content)
+        return
+    for item_id in ids:
+        item = items.get(item_id)
+        # An id statsapi does not know is recorded too, as an empty list, so a replay can tell it from one never asked
+        snapshot_store.record(f"{path}?{parameter}={item_id}",
+                              json.dumps({**body, list_key: [item] if item else []}, separators=(",", ":")).encode())
+
+
+def _lookup_snapshot(key, at=None):
+    """A stored body for the key: recorded as is, assembled from per-id records, or without optional parameters."""
+    content = snapshot_store.lookup(key, at)
+    if content is not None:
+        return content
+
+    batch = _snapshot_batch(key)
+    if batch is not None:
+        path, parameter, list_key, ids = batch
+        body, items = {}, []
+        for item_id in ids:
+            content = snapshot_store.lookup(f"{path}?{parameter}={item_id}", at)
+            if content is None:
+                return None
+            body = json.loads(content)
+            items.extend(body.get(list_key, []))
+        return json.dumps({**body, list_key: items}, separators=(",", ":")).encode()
+
+    path, _, query = key.partition("?")
+    params = query.split("&") if query else []
+    kept = [param for param in params if param.split("=", 1)[0] not in SNAPSHOT_OPTIONAL_PARAMS]
+    if len(kept) < len(params):
+        return snapshot_store.lookup(f"{path}?{'&'.join(kept)}" if kept else path, at)
+    return None
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def breaker_for(host):
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+        return breaker
+
+
+def _get_with_retries(url, timeout):
+    """GET with bounded, jittered retries; only ever used for idempotent GETs.
+
+    Returns the 200 response or raises the last error.
+    """
+    host = urlsplit(url).netloc
+    endpoint = metrics.endpoint_template(url)
+    breaker = breaker_for(host)
+    retry_budget.record_request()
+
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {host}")
+
+        started = time.perf_counter()
+        try:
+            response = get(url, timeout)
+        except requests.exceptions.RequestException as e:
+            timed_out = isinstance(e, requests.exceptions.Timeout)
+            if timed_out:
+                _count("timeouts")
+            metrics.upstream_request_duration.observe(endpoint, "timeout" if timed_out else "error",
+                                                      value=time.perf_counter() - started)
+            breaker.record_failure()
+            error = e
+        else:
+            metrics.upstream_request_duration.observe(endpoint, str(response.status_code),
+                                                      value=time.perf_counter() - started)
+            if response.status_code == 200:
+                breaker.record_success()
+                return response
+            error = UpstreamError(url, response.status_code)
+            if response.status_code not in RETRYABLE_STATUSES:
+                # The host is healthy, it just had nothing for us
+                breaker.record_success()
+                raise error
+            breaker.record_failure()
+
+        if attempt >= UPSTREAM_MAX_RETRIES or not retry_budget.try_spend():
+            raise error
+        attempt += 1
+        _count("retries")
+        time.sleep(backoff_delay(attempt))
+
+
+def _fetch_content(url, timeout):
+    """Body of a 200 answer: from statsapi (recorded when the snapshot store is on) or, when replaying, the store."""
+    if replaying:
+        content = _lookup_snapshot(_snapshot_key(url), _replay_clock())
+        if content is None:
+            raise SnapshotMissing(f"No snapshot of {url}")
+        return content
+
+    content = _get_with_retries(url, timeout).content
+    if snapshot_store is not None:
+        try:
+            _record_snapshot(_snapshot_key(url), content)
+        except OSError as e:
+            metrics.background_errors.inc("snapshot_record")
+            print(f"Error recording snapshot of {url}: {e}")
+    return content
+
+
+def _parse_json(content):
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as e:
+        # What response.json() raises, so callers catching RequestException still see it
+        raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos)
+
+
+def _remember(url, body, size):
+    """Keep a good body as the URL's fallback, evicting the oldest past the count or byte bound."""
+    global _fallback_bytes
+    if size > UPSTREAM_FALLBACK_MAX_BYTES:
+        return
+    with _fallback_lock:
+        old = _fallback.pop(url, None)
+        if old is not None:
+            _fallback_bytes -= old[1]
+        _fallback[url] = (body, size)
+        _fallback_bytes += size
+        while len(_fallback) > UPSTREAM_FALLBACK_SIZE or _fallback_bytes > UPSTREAM_FALLBACK_MAX_BYTES:
+            _fallback_bytes -= _fallback.popitem(last=False)[1][1]
+
+
+def _fetch_json(url, timeout, fallback):
+    try:
+        content = _fetch_content(url, timeout)
+        body = _parse_json(content)
+    except requests.exceptions.RequestException as e:
+        definitive = isinstance(e, UpstreamError) and e.status_code not in RETRYABLE_STATUSES
+        if fallback and not definitive and not replaying:
+            with _fallback_lock:
+                entry = _fallback.get(url)
+            if entry is not None:
+                _count("fallbackServed")
+                return entry[0]
+            # Older than anything in memory, but survives restarts
+            content = _lookup_snapshot(_snapshot_key(url)) if snapshot_store is not None else None
+            if content is not None:
+                _count("snapshotServed")
+                return _parse_json(content)
+        raise
+
+    if fallback:
+        _remember(url, body, len(content))
+    return body
+
+
+def fetch_json(url, timeout=UPSTREAM_TIMEOUT, fallback=True):
+    """GET a URL and return its parsed JSON body.
+
+    Identical requests already in flight are joined rather than repeated,
+    so the returned object may be shared between threads and must be
+    treated as read-only. Non-200 answers raise UpstreamError.
+
+    Transient failures are retried within the retry budget. When the call
+    still fails, or the host's breaker is open, the last good body for the
+    URL is returned if ``fallback`` is set and one is known.
+    """
+    return single_flight.do(url, lambda: _fetch_json(url, timeout, fallback))
+
+
+def fetch_bytes(url, timeout=UPSTREAM_TIMEOUT):
+    """GET a URL and return the raw body, with the same coalescing, retries and breaker as fetch_json."""
+    return single_flight.do(url, lambda: _fetch_content(url, timeout))
+
+
+def fetch_json_many(urls, timeout=UPSTREAM_TIMEOUT, fallback=True):
+    """fetch_json several URLs in parallel.
+
+    Results come back in the same order as ``urls``. A request that fails
+    leaves its exception in place of the body so one bad id does not
+    sink the whole batch.
+    """
+    futures = [_executor.submit(fetch_json, url, timeout, fallback) for url in urls]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except requests.exceptions.RequestException as e:
+            results.append(e)
+    return results
+
+
+def stats():
+    with _breakers_lock:
+        breakers = {host: breaker.stats() for host, breaker in _breakers.items()}
+    with _counters_lock:
+        counters = dict(_counters)
+    with _fallback_lock:
+        counters["fallbackEntries"] = len(_fallback)
+        counters["fallbackBytes"] = _fallback_bytes
+    return {
+        "singleFlight": single_flight.stats(),
+        "breakers": breakers,
+        "retryBudget": retry_budget.stats(),
+        "snapshots": snapshot_store.stats() if snapshot_store is not None else None,
+        **counters,
+    }
@@ -0,0 +1,151 @@
+import os
+import select
+import threading
+import uuid
+
+import psycopg2
+from psycopg2 import extensions
+
+import metrics
+
+# Postgres channel every worker listens on for follow-list and preference writes
+USER_CHANGES_CHANNEL = "user_changes"
+# Wait between attempts to re-establish a dropped LISTEN connection (seconds)
+USER_CHANGES_RECONNECT_SECONDS = float(os.getenv("USER_CHANGES_RECONNECT_SECONDS", 5))
+
+FOLLOWS = "follows"
+PREFERENCE = "preference"
+
+# (pid, id) of this process, made on first use after a fork
+_node = (None, None)
+
+
+def node_id():
+    """Identifies this process in payloads, so a worker can skip its own notifications.
+
+    Made per process id: workers forked from a preloaded app would
+    otherwise inherit one id and ignore each other's changes.
+    """
+    global _node
+    pid = os.getpid()
+    if _node[0] != pid:
+        _node = (pid, uuid.uuid4().hex[:12])
+    return _node[1]
+
+
+def notify(cur, user_id, change):
+    """Queue a change notification on the cursor's transaction; it is only delivered if that commits."""
+    cur.execute("SELECT pg_notify(%s, %s);", (USER_CHANGES_CHANNEL, f"{node_id()}:{user_id}:{change}"),
+                name="notify_user_change")
+
+
+def parse(payload):
+    """``(node id, user id, change)`` from a notification payload, or None if it is malformed."""
+    node, _, rest = payload.partition(":")
+    user_id, _, change = rest.partition(":")
+    try:
+        return node, int(user_id), change
+    except ValueError:
+        return None
+
+
+class UserChangeListener:
+    """Background LISTEN on the user changes channel, for keeping per-user caches coherent across workers.
+
+    Each notification from another worker is handed to the registered
+    callbacks as ``(user_id, change)``. While the connection is down
+    notifications are lost, so on every (re)connect the reset callbacks
+    run and caches start over; the caches' own TTL covers anything that
+    slips through regardless.
+    """
+
+    def __init__(self, dsn, channel=USER_CHANGES_CHANNEL, reconnect_seconds=USER_CHANGES_RECONNECT_SECONDS):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self._callbacks = []
+        self._reset_callbacks = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.connected = False
+        self.received = 0
+        self.applied = 0
+        self.reconnects = 0
+
+    def subscribe(self, callback, on_reset=None):
+        self._callbacks.append(callback)
+        if on_reset is not None:
+            self._reset_callbacks.append(on_reset)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._listen_loop, name="user-changes", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cur = conn.cursor()
+        cur.execute(f"LISTEN {self.channel};")
+        cur.close()
+        return conn
+
+    def _listen_loop(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                with self._lock:
+                    self.connected = True
+                # Anything written while we were not listening is unaccounted for
+                self._reset()
+                self._drain(conn)
+            except psycopg2.Error as e:
+                metrics.background_errors.inc("user_changes")
+                print(f"Error listening for user changes: {e}")
+            finally:
+                with self._lock:
+                    if self.connected:
+                        self.reconnects += 1
+                    self.connected = False
+                if conn is not None:
+                    conn.close()
+            self._stop.wait(self.reconnect_seconds)
+
+    def _drain(self, conn):
+        while not self._stop.is_set():
+            # Wake up now and then to notice stop(); poll() also surfaces a dropped connection
+            if select.select([conn], [], [], 1.0)[0]:
+                conn.poll()
+            while conn.notifies:
+                self._dispatch(conn.notifies.pop(0).payload)
+
+    def _dispatch(self, payload):
+        with self._lock:
+            self.received += 1
+        parsed = parse(payload)
+        if parsed is None or parsed[0] == node_id():
+            return
+        _, user_id, change = parsed
+        for callback in self._callbacks:
+            callback(user_id, change)
+        with self._lock:
+            self.applied += 1
+
+    def _reset(self):
+        for callback in self._reset_callbacks:
+            callback()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "connected": self.connected,
+                "received": self.received,
+                "applied": self.applied,
+                "reconnects": self.reconnects,
+            }
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+import metrics
+
+# Warm caches before reporting ready; set to 0 to report ready straight away
+WARM_UP = os.getenv("WARM_UP", "1").lower() not in ("0", "false", "no")
+# Most-followed players whose profiles are preloaded
+WARM_UP_PLAYERS = int(os.getenv("WARM_UP_PLAYERS", 500))
+# Give up on failing steps and report ready anyway after this long (seconds)
+WARM_UP_TIMEOUT = float(os.getenv("WARM_UP_TIMEOUT", 60))
+# Wait between attempts of a failing step (seconds)
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", 5))
+
+
+class WarmUp:
+    """Runs named start-up steps once, in order, on a background thread, and says when they are done.
+
+    A failing step is retried until the timeout and then given up on, so
+    a statsapi or database outage at start-up delays readiness instead of
+    keeping the worker out of rotation for good; whatever did not get
+    warmed is loaded on demand as usual.
+    """
+
+    def __init__(self, steps, timeout=WARM_UP_TIMEOUT, retry_seconds=WARM_UP_RETRY_SECONDS):
+        self.steps = steps
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self._ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._results = {name: {"status": "pending"} for name, _ in steps}
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+        self._thread.start()
+
+    def skip(self):
+        """Report ready without warming anything."""
+        with self._lock:
+            for result in self._results.values():
+                result["status"] = "skipped"
+        self._ready.set()
+
+    def _run(self):
+        deadline = time.monotonic() + self.timeout
+        for name, step in self.steps:
+            self._run_step(name, step, deadline)
+        self._ready.set()
+
+    def _run_step(self, name, step, deadline):
+        started = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                step()
+                status, error = "done", None
+            except Exception as e:
+                metrics.background_errors.inc("warm_up")
+                print(f"Error warming up {name}: {e}")
+                status, error = "failed", str(e)
+                if time.monotonic() + self.retry_seconds < deadline:
+                    time.sleep(self.retry_seconds)
+                    continue
+            break
+
+        with self._lock:
+            self._results[name] = {"status": status, "attempts": attempts,
+                                   "seconds": round(time.monotonic() - started, 3)}
+            if error is not None:
+                self._results[name]["error"] = error
+
+    def stats(self):
+        with self._lock:
+            return {"ready": self.ready, "steps": {name: dict(result) for name, result in self._results.items()}}
@@ -0,0 +1,147 @@
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import uuid
+from urllib.parse import urlsplit, urlunsplit
+
+import bcrypt
+import psycopg2
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from migrate import migrate  # noqa: E402
+
+# user_data predates the migrations directory, so the benchmarks create it themselves
+BASE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS user_data (
+        id SERIAL PRIMARY KEY,
+        username TEXT NOT NULL UNIQUE,
+        email TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        game_pk INTEGER,
+        player_id INTEGER[],
+        added_at TIMESTAMPTZ
+    );
+"""
+
+BENCH_PASSWORD = "bench-password"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class DisposablePostgres:
+    """A throwaway Postgres cluster in a temp directory, removed on exit.
+
+    Needs ``initdb`` and ``pg_ctl`` on the PATH (or in ``PG_BIN``).
+    """
+
+    def __init__(self, pg_bin=os.getenv("PG_BIN", "")):
+        self.pg_bin = pg_bin
+        self.directory = None
+        self.port = None
+
+    def _tool(self, name):
+        path = os.path.join(self.pg_bin, name) if self.pg_bin else shutil.which(name)
+        if not path:
+            raise RuntimeError(f"{name} not found; install PostgreSQL, set PG_BIN, or pass --dsn")
+        return path
+
+    @property
+    def dsn(self):
+        return f"postgresql://bench@127.0.0.1:{self.port}/postgres"
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp(prefix="stathub-pg-")
+        self.port = free_port()
+        data_dir = os.path.join(self.directory, "data")
+        subprocess.run([self._tool("initdb"), "-D", data_dir, "-U", "bench", "--auth=trust", "-E", "UTF8"],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([self._tool("pg_ctl"), "-D", data_dir, "-w", "-l", os.path.join(self.directory, "log"),
+                        "-o", f"-p {self.port} -k {self.directory} -c listen_addresses=127.0.0.1", "start"],
+                       check=True, stdout=subprocess.DEVNULL)
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.run([self._tool("pg_ctl"), "-D", os.path.join(self.directory, "data"), "-m", "immediate",
+                        "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class DisposableDatabase:
+    """A fresh database on an existing server, dropped on exit."""
+
+    def __init__(self, admin_dsn):
+        self.admin_dsn = admin_dsn
+        self.name = f"stathub_bench_{uuid.uuid4().hex[:8]}"
+
+    @property
+    def dsn(self):
+        parts = urlsplit(self.admin_dsn)
+        return urlunsplit(parts._replace(path=f"/{self.name}"))
+
+    def _admin(self, sql):
+        connection = psycopg2.connect(self.admin_dsn)
+        connection.autocommit = True
+        try:
+            connection.cursor().execute(sql)
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._admin(f"CREATE DATABASE {self.name};")
+        return self
+
+    def __exit__(self, *exc):
+        self._admin(f"DROP DATABASE IF EXISTS {self.name} WITH (FORCE);")
+
+
+def seed(dsn, users, follows, player_ids, rounds=12, seed=0):
+    """Create the schema and insert ``users`` users sharing ``follows`` follows between them.
+
+    Every user's password is BENCH_PASSWORD, hashed once at ``rounds``.
+    Follows are spread at random, with a skew towards the first players
+    so some are far more popular than others, like real ones.
+    """
+    rng = random.Random(seed)
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+    connection = psycopg2.connect(dsn)
+    try:
+        cur = connection.cursor()
+        cur.execute(BASE_SCHEMA)
+        connection.commit()
+        migrate(dsn)
+
+        cur.execute("""
+            INSERT INTO user_data (username, email, password)
+            SELECT 'user' || n, 'user' || n || '@bench.local', %s
+            FROM generate_series(1, %s) AS n
+            RETURNING id;
+        """, (password_hash, users))
+        user_ids = [row[0] for row in cur.fetchall()]
+
+        pairs = set()
+        limit = min(follows, len(user_ids) * len(player_ids))
+        while len(pairs) < limit:
+            player = player_ids[min(int(rng.paretovariate(1.2)) - 1, len(player_ids) - 1)
+                                if rng.random() < 0.5 else rng.randrange(len(player_ids))]
+            pairs.add((rng.choice(user_ids), player))
+        execute_values(cur, "INSERT INTO user_players (user_id, player_id) VALUES %s;", list(pairs),
+                       page_size=5000)
+
+        cur.execute("ANALYZE;")
+        connection.commit()
+        cur.close()
+    finally:
+        connection.close()
+
+    return user_ids
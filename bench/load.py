@@ -0,0 +1,195 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+
+class Context:
+    """What a request builder can draw from: tokens of signed-in users and known ids."""
+
+    def __init__(self, tokens, player_ids, team_ids, season, credentials=()):
+        self.tokens = tokens
+        self.player_ids = player_ids
+        self.team_ids = team_ids
+        self.season = season
+        self.credentials = credentials
+
+
+def _auth(rng, ctx):
+    return {"headers": {"Authorization": f"Bearer {rng.choice(ctx.tokens)}"}}
+
+
+# name -> builder(rng, ctx) returning (method, path, requests kwargs)
+ENDPOINTS = {
+    "GET /player/<id>": lambda rng, ctx: ("GET", f"/player/{rng.choice(ctx.player_ids)}", {}),
+    "GET /players?ids=": lambda rng, ctx: (
+        "GET", "/players?ids=" + ",".join(map(str, rng.sample(ctx.player_ids, min(20, len(ctx.player_ids))))), {}),
+    "GET /user/players": lambda rng, ctx: ("GET", "/user/players", _auth(rng, ctx)),
+    "GET /user/players/teams": lambda rng, ctx: ("GET", "/user/players/teams", _auth(rng, ctx)),
+    "GET /user/players/images": lambda rng, ctx: ("GET", "/user/players/images", _auth(rng, ctx)),
+    "GET /user/players/stats": lambda rng, ctx: ("GET", f"/user/players/stats?season={ctx.season}", _auth(rng, ctx)),
+    "GET /user/dashboard": lambda rng, ctx: ("GET", "/user/dashboard?fields=players,teams,images", _auth(rng, ctx)),
+    "GET /schedule": lambda rng, ctx: (
+        "GET", f"/schedule?season={ctx.season}&teamId={rng.choice(ctx.team_ids)}&pageSize=50", {}),
+    "GET /user/schedule": lambda rng, ctx: ("GET", f"/user/schedule?season={ctx.season}", _auth(rng, ctx)),
+    "POST /user/login": lambda rng, ctx: ("POST", "/user/login", {"json": dict(zip(("email", "password"),
+                                                                                   rng.choice(ctx.credentials)))}),
+}
+
+# Relative weights of the default mix; login is rare because bcrypt dominates it
+DEFAULT_MIX = {
+    "GET /user/dashboard": 4,
+    "GET /user/players": 3,
+    "GET /user/players/teams": 2,
+    "GET /user/players/images": 1,
+    "GET /user/players/stats": 1,
+    "GET /player/<id>": 2,
+    "GET /players?ids=": 1,
+    "GET /schedule": 1,
+    "GET /user/schedule": 1,
+}
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return round(sorted_values[rank - 1], 3)
+
+
+def summarize(samples, elapsed):
+    """Per-endpoint throughput, status counts and latency percentiles (ms)."""
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample[0]].append(sample)
+
+    def block(rows):
+        latencies = sorted(row[1] * 1000 for row in rows)
+        statuses = Counter(str(row[2]) for row in rows)
+        errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "statuses": dict(statuses),
+            "throughput": round(len(rows) / elapsed, 2) if elapsed else None,
+            "latencyMs": {
+                "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": round(latencies[-1], 3) if latencies else None,
+            },
+        }
+
+    return {
+        "durationSeconds": round(elapsed, 3),
+        "total": block(samples),
+        "endpoints": {name: block(rows) for name, rows in sorted(by_endpoint.items())},
+    }
+
+
+def run_load(base_url, ctx, mix=None, concurrency=8, duration=30.0, warmup=5.0, seed=0, timeout=30):
+    """Closed-loop load: ``concurrency`` workers each send the next request as soon as one returns.
+
+    Requests finished during ``warmup`` are thrown away so cold caches do
+    not skew the percentiles. Connection errors count with status "error".
+    """
+    mix = mix or DEFAULT_MIX
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = []
+    samples_lock = threading.Lock()
+    start = time.monotonic()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        session = requests.Session()
+        local = []
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            name = rng.choices(names, weights)[0]
+            method, path, kwargs = ENDPOINTS[name](rng, ctx)
+            began = time.perf_counter()
+            try:
+                status = session.request(method, base_url + path, timeout=timeout, **kwargs).status_code
+            except requests.exceptions.RequestException:
+                status = "error"
+            latency = time.perf_counter() - began
+            if now >= measure_from:
+                local.append((name, latency, status))
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return summarize(samples, time.monotonic() - measure_from)
+
+
+def login(base_url, credentials):
+    """Sign in each (email, password) pair and return the tokens."""
+    session = requests.Session()
+    tokens = []
+    for email, password in credentials:
+        response = session.post(f"{base_url}/user/login", json={"email": email, "password": password}, timeout=60)
+        response.raise_for_status()
+        tokens.append(response.json()["token"])
+    return tokens
+
+
+def parse_mix(text):
+    """'GET /user/players=3,GET /schedule=1' -> {name: weight}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.rpartition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}; choose from {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive load at an already running backend.")
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--users", type=int, default=20, help="seeded users (user<n>@bench.local) to sign in as")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--player-ids", required=True, help="comma-separated player ids to request")
+    parser.add_argument("--team-ids", required=True, help="comma-separated team ids to request")
+    parser.add_argument("--season", type=int, required=True)
+    parser.add_argument("--mix", type=parse_mix, help="endpoint weights, e.g. 'GET /user/players=3,GET /schedule=1'")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    credentials = [(f"user{n}@bench.local", args.password) for n in range(1, args.users + 1)]
+    ctx = Context(login(args.base_url, credentials),
+                  [int(i) for i in args.player_ids.split(",")],
+                  [int(i) for i in args.team_ids.split(",")],
+                  args.season, credentials)
+    report = run_load(args.base_url, ctx, args.mix, args.concurrency, args.duration, args.warmup)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+import requests
+
+from database import BENCH_PASSWORD, DisposableDatabase, DisposablePostgres, free_port, seed
+from load import Context, login, parse_mix, run_load
+from statsapi_fake import FIXTURES_DIR, load_world
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def wait_for(url, timeout=60, status=None):
+    """Poll until the URL answers at all, or with ``status`` when one is given."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = requests.get(url, timeout=2)
+            if status is None or response.status_code == status:
+                return
+        except requests.exceptions.RequestException:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not come up within {timeout}s")
+        time.sleep(0.2)
+
+
+@contextlib.contextmanager
+def process(args, env=None, cwd=None):
+    # Own process group, so the server's forked hashing workers go down with it
+    proc = subprocess.Popen(args, env=env, cwd=cwd, start_new_session=True)
+    try:
+        yield proc
+    finally:
+        _signal_group(proc, signal.SIGTERM)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _signal_group(proc, signal.SIGKILL)
+            proc.wait()
+
+
+def _signal_group(proc, sig):
+    try:
+        os.killpg(proc.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the backend against a fake statsapi and a freshly seeded Postgres.")
+    parser.add_argument("--dsn", default=os.getenv("BENCH_ADMIN_DSN"),
+                        help="existing server to create a throwaway database on (default: start a temp cluster)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--follows", type=int, default=10000)
+    parser.add_argument("--login-users", type=int, default=50, help="users signed in up front for the token pool")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--season", type=int, default=date.today().year)
+    parser.add_argument("--latency-ms", type=float, default=50, help="statsapi response delay")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of statsapi calls that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--mix", type=parse_mix)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="free text stored with the results")
+    parser.add_argument("--output", help="results file (default: bench/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc)
+    world = load_world(args.fixtures, args.season, args.seed)
+    player_ids = world.player_ids
+    team_ids = [team["id"] for team in world.teams]
+
+    fake_port = free_port()
+    app_port = free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    database = DisposableDatabase(args.dsn) if args.dsn else DisposablePostgres()
+    with database, tempfile.TemporaryDirectory(prefix="stathub-bench-") as scratch:
+        print(f"Seeding {args.users} users and {args.follows} follows...", flush=True)
+        seed(database.dsn, args.users, args.follows, player_ids, args.bcrypt_rounds, args.seed)
+
+        fake_args = [sys.executable, os.path.join(BENCH_DIR, "statsapi_fake.py"), "--port", str(fake_port),
+                     "--fixtures", args.fixtures, "--season", str(args.season), "--seed", str(args.seed),
+                     "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                     "--error-rate", str(args.error_rate), "--error-status", str(args.error_status)]
+        app_env = dict(os.environ,
+                       DATABASE_URL=database.dsn,
+                       STATSAPI_URL=fake_url,
+                       JWT_SECRET_KEY=secrets.token_hex(32),
+                       BCRYPT_LOG_ROUNDS=str(args.bcrypt_rounds),
+                       HEADSHOT_CACHE_DIR=os.path.join(scratch, "headshots"))
+        # Threaded dev server without the reloader, which would fork a second copy
+        app_args = [sys.executable, "-c",
+                    f"import server; server.create_app().run(host='127.0.0.1', port={app_port}, threaded=True)"]
+
+        with process(fake_args), process(app_args, env=app_env, cwd=APP_DIR):
+            wait_for(fake_url + "/__stats")
+            # Measure a warmed-up worker, as a load balancer would only route to one
+            wait_for(app_url + "/ready", timeout=120, status=200)
+
+            credentials = [(f"user{n}@bench.local", BENCH_PASSWORD)
+                           for n in range(1, min(args.login_users, args.users) + 1)]
+            ctx = Context(login(app_url, credentials), player_ids, team_ids, args.season, credentials)
+
+            print(f"Running {args.duration}s at concurrency {args.concurrency}...", flush=True)
+            report = run_load(app_url, ctx, args.mix, args.concurrency, args.duration, args.warmup, args.seed)
+            report["upstreamRequests"] = requests.get(fake_url + "/__stats", timeout=5).json()
+            report["serverStats"] = requests.get(app_url + "/stats", timeout=5).json()
+
+    report["meta"] = {
+        "label": args.label,
+        "startedAt": started_at.isoformat(),
+        "gitRevision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("dsn", "mix")},
+        "mix": args.mix,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, started_at.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, block in report["endpoints"].items():
+        latency = block["latencyMs"]
+        print(f"{name:28} {block['throughput']:>8} req/s  p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  "
+              f"p99 {latency['p99']:.1f} ms  errors {block['errors']}")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+STATSAPI_URL = "https://statsapi.mlb.com"
+POSITIONS = ["Pitcher", "Catcher", "First Base", "Second Base", "Third Base", "Shortstop",
+             "Outfielder", "Designated Hitter"]
+
+
+class World:
+    """The statsapi data the stand-in serves: teams, rosters, people and one season's schedule."""
+
+    def __init__(self, teams, rosters, people, schedule):
+        self.teams = teams
+        self.rosters = rosters
+        self.people = people
+        self.schedule = schedule
+
+    @property
+    def player_ids(self):
+        return sorted(self.people)
+
+    @classmethod
+    def synthetic(cls, season, seed=0, team_count=30, roster_size=26):
+        """A deterministic league shaped like MLB's, for when nothing has been recorded."""
+        rng = random.Random(seed)
+        teams = [{"id": 101 + i, "name": f"Team {101 + i}", "abbreviation": f"T{i:02d}"}
+                 for i in range(team_count)]
+
+        rosters = {}
+        people = {}
+        for t, team in enumerate(teams):
+            roster = []
+            for n in range(roster_size):
+                player_id = 600000 + t * 100 + n
+                position = POSITIONS[0] if n < 13 else rng.choice(POSITIONS[1:])
+                people[player_id] = {
+                    "id": player_id,
+                    "fullName": f"Player {player_id}",
+                    "primaryNumber": str(rng.randint(1, 99)),
+                    "birthDate": f"{rng.randint(1985, 2002)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                    "currentAge": rng.randint(21, 39),
+                    "birthCity": "Springfield",
+                    "birthCountry": "USA",
+                    "height": f"6' {rng.randint(0, 6)}\"",
+                    "weight": rng.randint(170, 250),
+                    "primaryPosition": {"name": position},
+                    "mlbDebutDate": f"{rng.randint(2008, season)}-04-{rng.randint(1, 28):02d}",
+                    "batSide": {"description": rng.choice(["Right", "Left"])},
+                    "pitchHand": {"description": rng.choice(["Right", "Left"])},
+                    "currentTeam": {"id": team["id"]},
+                }
+                roster.append({"person": {"id": player_id, "fullName": f"Player {player_id}"},
+                               "position": {"name": position}})
+            rosters[team["id"]] = roster
+
+        # Every team plays every day for ~26 weeks, paired off at random
+        dates = []
+        game_pk = 700000
+        opening_day = date(season, 3, 28)
+        for day in range(182):
+            official_date = (opening_day + timedelta(days=day)).isoformat()
+            order = teams[:]
+            rng.shuffle(order)
+            games = []
+            for away, home in zip(order[::2], order[1::2]):
+                game_pk += 1
+                games.append({
+                    "gamePk": game_pk,
+                    "officialDate": official_date,
+                    "gameDate": f"{official_date}T23:05:00Z",
+                    "status": {"detailedState": "Scheduled"},
+                    "teams": {"away": {"team": {"id": away["id"], "name": away["name"]}},
+                              "home": {"team": {"id": home["id"], "name": home["name"]}}},
+                })
+            dates.append({"date": official_date, "games": games})
+
+        return cls(teams, rosters, people, {"dates": dates})
+
+    @classmethod
+    def record(cls, season, base_url=STATSAPI_URL):
+        """Download one season's teams, rosters, people and schedule from the real statsapi."""
+        session = requests.Session()
+
+        def fetch(path):
+            response = session.get(base_url + path, timeout=30)
+            response.raise_for_status()
+            return response.json()
+
+        teams = fetch(f"/api/v1/teams?sportId=1&season={season}")["teams"]
+        rosters = {team["id"]: fetch(f"/api/v1/teams/{team['id']}/roster?season={season}").get("roster", [])
+                   for team in teams}
+        people = {person["id"]: person
+                  for person in fetch(f"/api/v1/sports/1/players?season={season}").get("people", [])}
+        schedule = fetch(f"/api/v1/schedule?sportId=1&season={season}")
+        return cls(teams, rosters, people, schedule)
+
+    @classmethod
+    def load(cls, directory):
+        def read(name):
+            with open(os.path.join(directory, name)) as f:
+                return json.load(f)
+
+        rosters = {int(team_id): roster for team_id, roster in read("rosters.json").items()}
+        people = {int(player_id): person for player_id, person in read("people.json").items()}
+        return cls(read("teams.json"), rosters, people, read("schedule.json"))
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, data in (("teams.json", self.teams), ("rosters.json", self.rosters),
+                           ("people.json", self.people), ("schedule.json", self.schedule)):
+            with open(os.path.join(directory, name), "w") as f:
+                json.dump(data, f)
+
+
+def load_world(directory=FIXTURES_DIR, season=None, seed=0):
+    """Recorded fixtures when there are any, otherwise a synthetic league."""
+    if os.path.exists(os.path.join(directory, "teams.json")):
+        return World.load(directory)
+    return World.synthetic(season or date.today().year, seed=seed)
+
+
+class FaultInjection:
+    """Latency and error settings applied to every response."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """(delay in seconds, status to fail with or None) for one request."""
+        with self._lock:
+            delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+            fail = self._rng.random() < self.error_rate
+        return delay / 1000, self.error_status if fail else None
+
+
+class StatsApiFake(ThreadingHTTPServer):
+    """Threaded HTTP server answering the statsapi routes the backend uses."""
+
+    daemon_threads = True
+
+    def __init__(self, address, world, faults):
+        super().__init__(address, _Handler)
+        self.world = world
+        self.faults = faults
+        self.requests = Counter()
+        self._requests_lock = threading.Lock()
+        # Bodies that never change are encoded once
+        self._teams_body = json.dumps({"teams": world.teams}).encode()
+        self._schedule_body = json.dumps(world.schedule).encode()
+        self._players_body = json.dumps({"people": list(world.people.values())}).encode()
+        self._roster_bodies = {team_id: json.dumps({"roster": roster}).encode()
+                               for team_id, roster in world.rosters.items()}
+        self._team_games = {}
+        for day in world.schedule.get("dates", []):
+            for game in day.get("games", []):
+                for side in ("away", "home"):
+                    team_id = game["teams"][side]["team"]["id"]
+                    self._team_games.setdefault(team_id, []).append((day["date"], game["gamePk"], side == "home"))
+
+    def count(self, route):
+        with self._requests_lock:
+            self.requests[route] += 1
+
+    def game_log(self, person, start=""):
+        """Deterministic hitting and pitching game logs for a person's team games played so far."""
+        today = date.today().isoformat()
+        is_pitcher = person.get("primaryPosition", {}).get("name") == "Pitcher"
+        hitting, pitching = [], []
+        for game_date, game_pk, is_home in self._team_games.get(person.get("currentTeam", {}).get("id"), []):
+            if game_date > today or game_date < start:
+                continue
+            rng = random.Random(person["id"] * 1_000_003 + game_pk)
+            split = {"date": game_date, "isHome": is_home, "game": {"gamePk": game_pk}}
+            if is_pitcher:
+                if rng.random() < 0.2:
+                    outs = rng.randint(1, 21)
+                    pitching.append(dict(split, stat={
+                        "outs": outs, "earnedRuns": rng.randint(0, 4), "hits": rng.randint(0, 8),
+                        "baseOnBalls": rng.randint(0, 4), "hitByPitch": rng.randint(0, 1),
+                        "strikeOuts": rng.randint(0, 10), "homeRuns": rng.randint(0, 2),
+                        "battersFaced": outs + rng.randint(0, 10)}))
+            elif rng.random() < 0.85:
+                at_bats = rng.randint(2, 5)
+                hits = rng.randint(0, min(at_bats, 3))
+                walks = rng.randint(0, 1)
+                hitting.append(dict(split, stat={
+                    "atBats": at_bats, "hits": hits, "doubles": int(hits > 1), "triples": 0,
+                    "homeRuns": int(hits > 0 and rng.random() < 0.15), "baseOnBalls": walks, "hitByPitch": 0,
+                    "sacFlies": 0, "plateAppearances": at_bats + walks, "strikeOuts": rng.randint(0, 2),
+                    "rbi": rng.randint(0, 2)}))
+        return {"stats": [{"group": {"displayName": "hitting"}, "splits": hitting},
+                          {"group": {"displayName": "pitching"}, "splits": pitching}]}
+
+    def route(self, path, query):
+        """(route name, status, body) for a request path."""
+        parts = path.strip("/").split("/")
+        if parts[:3] == ["api", "v1", "teams"] and len(parts) == 3:
+            return "teams", 200, self._teams_body
+        if parts[:3] == ["api", "v1", "teams"] and len(parts) == 5 and parts[4] == "roster":
+            body = self._roster_bodies.get(int(parts[3])) if parts[3].isdigit() else None
+            if body is not None:
+                return "roster", 200, body
+        if parts == ["api", "v1", "people"]:
+            ids = [int(i) for i in query.get("personIds", [""])[0].split(",") if i.strip().isdigit()]
+            people = [self.world.people[i] for i in ids if i in self.world.people]
+            return "people", 200, json.dumps({"people": people}).encode()
+        if parts[:3] == ["api", "v1", "people"] and len(parts) == 5 and parts[4] == "stats":
+            person = self.world.people.get(int(parts[3])) if parts[3].isdigit() else None
+            if person is not None:
+                start = query.get("startDate", [""])[0]
+                return "gameLog", 200, json.dumps(self.game_log(person, start)).encode()
+        if parts == ["api", "v1", "sports", "1", "players"]:
+            return "sportPlayers", 200, self._players_body
+        if parts == ["api", "v1", "schedule"]:
+            return "schedule", 200, self._schedule_body
+        if parts == ["__stats"]:
+            with self._requests_lock:
+                return None, 200, json.dumps(dict(self.requests)).encode()
+        return "unknown", 404, b'{"messageNumber": 404}'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        route, status, body = self.server.route(url.path, parse_qs(url.query))
+
+        if route is not None:
+            self.server.count(route)
+            delay, error_status = self.server.faults.draw()
+            if delay:
+                time.sleep(delay)
+            if error_status is not None:
+                status, body = error_status, b'{"message": "injected error"}'
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the MLB Stats API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="directory of recorded payloads")
+    parser.add_argument("--season", type=int, default=date.today().year)
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic league and fault draws")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fixed delay added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra uniform random delay on top")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--record", action="store_true",
+                        help="download --season from the real statsapi into --fixtures and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        World.record(args.season).save(args.fixtures)
+        print(f"Recorded {args.season} into {args.fixtures}")
+        return
+
+    world = load_world(args.fixtures, args.season, args.seed)
+    faults = FaultInjection(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.seed)
+    server = StatsApiFake((args.host, args.port), world, faults)
+    print(f"Fake statsapi on http://{args.host}:{server.server_port} "
+          f"({len(world.teams)} teams, {len(world.people)} people)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+// Apply RFC 6902 JSON Patch operations without mutating the input.
+// Only the objects along each patched path are copied, so React sees
+// new references where data changed and keeps the rest untouched.
+
+const parsePath = (path) =>
+  path === '' ? [] : path.split('/').slice(1).map(token => token.replace(/~1/g, '/').replace(/~0/g, '~'));
+
+const getIn = (doc, tokens) =>
+  tokens.reduce((node, token) => (Array.isArray(node) ? node[Number(token)] : node[token]), doc);
+
+const updateIn = (node, tokens, update) => {
+  if (tokens.length === 0) {
+    return update(undefined, undefined, true);
+  }
+  const [token, ...rest] = tokens;
+  const copy = Array.isArray(node) ? [...node] : { ...node };
+
+  if (rest.length === 0) {
+    return update(copy, token, false);
+  }
+  const key = Array.isArray(copy) ? Number(token) : token;
+  copy[key] = updateIn(copy[key], rest, update);
+  return copy;
+};
+
+const applyOperation = (doc, op) => {
+  const tokens = parsePath(op.path);
+
+  switch (op.op) {
+    case 'add':
+    case 'replace':
+      return updateIn(doc, tokens, (parent, key, isRoot) => {
+        if (isRoot) return op.value;
+        if (Array.isArray(parent)) {
+          if (op.op === 'add') {
+            parent.splice(key === '-' ? parent.length : Number(key), 0, op.value);
+          } else {
+            parent[Number(key)] = op.value;
+          }
+        } else {
+          parent[key] = op.value;
+        }
+        return parent;
+      });
+    case 'remove':
+      return updateIn(doc, tokens, (parent, key) => {
+        if (Array.isArray(parent)) {
+          parent.splice(Number(key), 1);
+        } else {
+          delete parent[key];
+        }
+        return parent;
+      });
+    case 'copy':
+      return applyOperation(doc, { op: 'add', path: op.path, value: getIn(doc, parsePath(op.from)) });
+    case 'move': {
+      const value = getIn(doc, parsePath(op.from));
+      const removed = applyOperation(doc, { op: 'remove', path: op.from });
+      return applyOperation(removed, { op: 'add', path: op.path, value });
+    }
+    default:
+      return doc;
+  }
+};
+
+const applyPatch = (doc, ops) => ops.reduce(applyOperation, doc);
+
+export { applyPatch };
@@ -1,5 +1,6 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { fetchProtectedData } from './api';
+import { applyPatch } from './jsonPatch';
 import translateText from './translationServer';
 
 const LiveFeed = ({ language, onLoad }) => {
@@ -11,6 +12,8 @@ const LiveFeed = ({ language, onLoad }) => {
   const [liveFeedData, setLiveFeedData] = useState(null);
   const [translatedText, setTranslatedText] = useState({});
   const [translatedPlayDescription, setTranslatedPlayDescription] = useState('');
+  const feedSource = useRef(null);
+  const feedData = useRef(null);
 
   // Generate years from 1901 to 2024
   const years = Array.from({ length: 2024 - 1901 + 1 }, (_, i) => (1901 + i).toString());
@@ -22,6 +25,9 @@ const LiveFeed = ({ language, onLoad }) => {
   useEffect(() => {
     // Fetch saved game_pk on component mount
     fetchGamePreferences();
+
+    // Stop streaming when the component goes away
+    return () => feedSource.current?.close();
   }, []);
 
   // Fetch saved preferences on component mount
@@ -41,32 +47,67 @@ const LiveFeed = ({ language, onLoad }) => {
     }
   };
 
-  // Fetch live feed data for a specific game
-  const fetchLiveFeed = async (gamePk) => {
+  // Stream live feed data for a specific game: the server sends a full
+  // snapshot first, then only the JSON patches for each update
+  const fetchLiveFeed = (gamePk) => {
+    feedSource.current?.close();
 
-    try {
-      const response = await fetch(
-        `https://statsapi.mlb.com/api/v1.1/game/${gamePk}/feed/live`
-      );
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
+    const source = new EventSource(`http://localhost:5000/games/${gamePk}/stream`);
+    feedSource.current = source;
+    let loaded = false;
+
+    const finishLoading = () => {
+      if (!loaded) {
+        loaded = true;
+        if (onLoad) {
+          onLoad();
+        }
+      }
+    };
+
+    const playDescription = (data) => data?.liveData?.plays?.currentPlay?.result?.description;
+
+    const showFeed = (data) => {
+      const previous = feedData.current;
+      feedData.current = data;
+      setLiveFeedData(data);
+
+      // Only re-translate when there is a new play to describe
+      if (!previous || playDescription(previous) !== playDescription(data)) {
+        translateDynamicContent(data);
       }
-      const data = await response.json();
+    };
+
+    source.addEventListener('snapshot', (event) => {
+      const data = JSON.parse(event.data);
 
       // Validate the required data structure
       if (!data?.gameData || !data?.liveData) {
-        throw new Error('Invalid live feed data structure');
+        setError('No live feed data available.');
+        source.close();
+      } else {
+        feedData.current = null;
+        showFeed(data);
       }
+      finishLoading();
+    });
 
-      setLiveFeedData(data);
-      await translateDynamicContent(data);
-    } catch (err) {
-      setError('No live feed data available.');
-    } finally {
-      if (onLoad) {
-        onLoad();
+    source.addEventListener('patch', (event) => {
+      if (feedData.current) {
+        showFeed(applyPatch(feedData.current, JSON.parse(event.data)));
       }
-    }
+    });
+
+    source.addEventListener('final', () => source.close());
+
+    source.onerror = () => {
+      // EventSource reconnects on its own once a feed has loaded
+      if (!loaded) {
+        setError('No live feed data available.');
+        source.close();
+        finishLoading();
+      }
+    };
   };
 
   // Save preferences to flask endpoint
@@ -97,26 +138,33 @@ const LiveFeed = ({ language, onLoad }) => {
     }
   };
 
-  // Fetch games for selected season
+  // Fetch games for selected season from the server-side schedule index
   const fetchGames = async (season) => {
     setLoading(true);
     setError('');
     try {
-      const response = await fetch(
-        `https://statsapi.mlb.com/api/v1/schedule?sportId=1&season=${season}`
-      );
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      const data = await response.json();
-      const gamesData = data.dates.flatMap((date, dateIndex) =>
-        date.games.map((game, gameIndex) => ({
-          gamePk: game.gamePk,
-          gameDate: new Date(game.gameDate).toLocaleDateString(),
-          teams: `${game.teams.away.team.name} @ ${game.teams.home.team.name}`,
-          uniqueId: `${dateIndex}-${gameIndex}-${game.gamePk}`
-        }))
-      );
+      const gamesData = [];
+      let page = 1;
+      let total = 0;
+      do {
+        const response = await fetch(
+          `http://localhost:5000/schedule?season=${season}&page=${page}&pageSize=500`
+        );
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = await response.json();
+        total = data.total;
+        data.games.forEach(game => {
+          gamesData.push({
+            gamePk: game.gamePk,
+            gameDate: new Date(game.gameDate).toLocaleDateString(),
+            teams: `${game.away.name} @ ${game.home.name}`,
+            uniqueId: `${gamesData.length}-${game.gamePk}`
+          });
+        });
+        page += 1;
+      } while (gamesData.length < total);
       setGames(gamesData);
     } catch (err) {
       setError('Failed to fetch games');
@@ -40,10 +40,13 @@ const PlayerSelector = ({ language, onLoad }) => {
   useEffect(() => {
   const fetchUserPlayersAndImages = async () => {
     try {
-      const players = await fetchProtectedData('http://127.0.0.1:5000/user/players');
-      setSelectedPlayers(players);
-      await fetchPlayerImages();
-      await fetchPlayerTeams();
+      // Players, headshots and teams arrive together in one round trip
+      const dashboard = await fetchProtectedData('http://127.0.0.1:5000/user/dashboard?fields=players,images,teams');
+      setSelectedPlayers(dashboard.players);
+      setPlayerImages(dashboard.images);
+      setImagesLoaded(true);
+      setPlayerTeams(dashboard.teams);
+      setTeamsLoaded(true);
     } catch (err) {
       if (err.response && err.response.status === 401) {
         localStorage.removeItem('authToken');
@@ -134,32 +137,6 @@ const PlayerSelector = ({ language, onLoad }) => {
     }
   };
 
-  // Fetch headshot image for each player
-  const fetchPlayerImages = async () => {
-    try {
-      const images = await fetchProtectedData('http://127.0.0.1:5000/user/players/images');
-      const newImages = {};
-      for (const playerId in images) {
-        newImages[playerId] = images[playerId];
-      }
-
-      setPlayerImages(images);
-      setImagesLoaded(true);
-    } catch (err) {
-      console.error('Failed to fetch player images:', err);
-    }
-  };
-
-  const fetchPlayerTeams = async () => {
-    try {
-      const teams = await fetchProtectedData('http://127.0.0.1:5000/user/players/teams');
-      setPlayerTeams(teams);
-      setTeamsLoaded(true)
-    } catch (error) {
-      console.error("Failed to fetch player teams:", error);
-    }
-  };
-
   const translateContent = async () => {
     try {
       const translations = await Promise.all([ // Translate all texts concurrently for efficiency